@@ -0,0 +1,224 @@
+""" Duplicate and near-duplicate detection for parsed addresses. """
+from argparse import ArgumentParser
+from difflib import SequenceMatcher
+import hashlib
+import re
+import sys
+
+from address_sinks import SINKS, open_sink
+from addresses import iter_addresses
+
+# common USPS street suffix and directional abbreviations, by full word
+ABBREVIATIONS = {
+    "avenue": "ave", "av": "ave", "boulevard": "blvd", "center": "ctr",
+    "circle": "cir", "court": "ct", "drive": "dr", "expressway": "expy",
+    "highway": "hwy", "hiway": "hwy", "lane": "ln", "parkway": "pkwy",
+    "place": "pl", "plaza": "plz", "road": "rd", "route": "rte",
+    "square": "sq", "street": "st", "str": "st", "terrace": "ter",
+    "turnpike": "tpke", "way": "wy", "north": "n", "south": "s",
+    "east": "e", "west": "w", "northeast": "ne", "northwest": "nw",
+    "southeast": "se", "southwest": "sw", "mount": "mt", "saint": "st",
+    "suite": "ste",
+}
+
+# normalized directional and street suffix words
+DIRECTIONS = frozenset({"n", "s", "e", "w", "ne", "nw", "se", "sw"})
+SUFFIXES = frozenset({"ave", "blvd", "cir", "ct", "ctr", "dr", "expy", "hwy",
+                      "ln", "pkwy", "pl", "plz", "rd", "rte", "sq", "st",
+                      "ter", "tpke", "wy"})
+
+# street name similarity (0 to 1) at or above which two addresses in the same
+# block are considered the same place
+NEAR_THRESHOLD = 0.9
+
+PUNCTUATION = re.compile(r"[^\w\s-]")
+
+
+def normalize_text(text):
+    """ Casefold, drop punctuation, collapse spaces and abbreviate words.
+
+    Args:
+        text (str): an address field, e.g. "66-4 Parkhurst Road.".
+
+    Returns:
+        str: the normalized text, e.g. "66-4 parkhurst rd".
+    """
+    words = PUNCTUATION.sub(" ", text.casefold()).split()
+    return " ".join(ABBREVIATIONS.get(word, word) for word in words)
+
+
+def normalize_address(address):
+    """ Normalize every field of a parsed address.
+
+    Args:
+        address (dict): a parsed address (see addresses.parse_address()).
+
+    Returns:
+        tuple of str: normalized house number, street, city, state and zip.
+    """
+    return (normalize_text(address["house_number"]),
+            normalize_text(address["street"]),
+            normalize_text(address["city"]),
+            address["state"].strip().upper(),
+            address["zip"].strip()[:5])
+
+
+def split_street(street):
+    """ Split a normalized street into its directions, name and suffix.
+
+    A word is only taken as a direction or suffix if some name is left,
+    so "n st" is the street named "st" with the pre-direction "n".
+
+    Args:
+        street (str): a street normalized by normalize_text(), e.g.
+            "s meridian st".
+
+    Returns:
+        tuple of str: pre-direction, name, suffix and post-direction,
+        e.g. ("s", "meridian", "st", ""); missing parts are "".
+    """
+    words = street.split()
+    pre = words.pop(0) if len(words) > 1 and words[0] in DIRECTIONS else ""
+    post = words.pop() if len(words) > 1 and words[-1] in DIRECTIONS else ""
+    suffix = words.pop() if len(words) > 1 and words[-1] in SUFFIXES else ""
+    return pre, " ".join(words), suffix, post
+
+
+def canonical_key(normalized):
+    """ Hash a normalized address to a compact fixed-size key.
+
+    Args:
+        normalized (tuple of str): as returned by normalize_address().
+
+    Returns:
+        bytes: a 16-byte BLAKE2b digest.
+    """
+    return hashlib.blake2b("\x1f".join(normalized).encode(),
+                           digest_size=16).digest()
+
+
+class Deduplicator:
+    """ Streaming exact and near-duplicate detection for addresses.
+
+    Exact duplicates are found by hashing the normalized address, so
+    "Rd" and "Road" variants collapse to one key. Near duplicates are
+    only looked for within a block of addresses sharing a state, zip
+    and house number; blocks stay small, so no all-pairs comparison is
+    ever made. Within a block, streets must have the same directions
+    and suffix (E/W Washington St or Washington St/Ave are different
+    streets), and only their names are compared by similarity.
+
+    Attributes:
+        threshold (float): street name similarity needed for a near
+            duplicate.
+        keys (set of bytes): canonical keys of every unique address.
+        blocks (dict of tuple: list of tuple): streets of the unique
+            addresses in each (state, zip, house number) block, split by
+            split_street().
+        seen (int): number of addresses checked.
+        exact (int): number of exact duplicates found.
+        near (int): number of near duplicates found.
+    """
+    def __init__(self, threshold=NEAR_THRESHOLD):
+        self.threshold = threshold
+        self.keys = set()
+        self.blocks = {}
+        self.seen = 0
+        self.exact = 0
+        self.near = 0
+
+    def check(self, address):
+        """ Classify an address against those already checked.
+
+        Args:
+            address (dict): a parsed address.
+
+        Returns:
+            str: "exact" or "near" if it duplicates an earlier address,
+            otherwise "unique" (and it is remembered).
+        """
+        self.seen += 1
+        normalized = normalize_address(address)
+        key = canonical_key(normalized)
+        if key in self.keys:
+            self.exact += 1
+            return "exact"
+
+        house_number, street, _, state, zip_code = normalized
+        block = self.blocks.setdefault((state, zip_code, house_number), [])
+        parts = split_street(street)
+        if self.threshold < 1:
+            pre, name, suffix, post = parts
+            # the new name is seq2, which SequenceMatcher preprocesses once
+            matcher = SequenceMatcher(None, "", name)
+            for other in block:
+                if (other[0], other[2], other[3]) != (pre, suffix, post):
+                    continue
+                matcher.set_seq1(other[1])
+                if (matcher.real_quick_ratio() >= self.threshold
+                        and matcher.quick_ratio() >= self.threshold
+                        and matcher.ratio() >= self.threshold):
+                    self.near += 1
+                    return "near"
+        self.keys.add(key)
+        block.append(parts)
+        return "unique"
+
+    def unique(self, addresses):
+        """ Filter an iterable of addresses down to the unique ones.
+
+        Args:
+            addresses (iterable of dict): parsed addresses, e.g. from
+                several files chained together.
+
+        Yields:
+            dict: the first address of each duplicate group.
+        """
+        for address in addresses:
+            if self.check(address) == "unique":
+                yield address
+
+
+def main(file_paths, threshold=NEAR_THRESHOLD, format="repr", output=None,
+         workers=1):
+    """ Write the unique addresses across several files.
+
+    Args:
+        file_paths (list of str): files containing one address per line.
+        threshold (float): street name similarity needed for a near
+            duplicate; 1 disables near-duplicate detection.
+        format (str): output format, one of address_sinks.SINKS.
+        output (str): output file, or None for stdout.
+        workers (int): number of processes to parse each file with.
+
+    Side effects:
+        Writes to stdout or output, and a summary to stderr.
+    """
+    dedup = Deduplicator(threshold)
+    addresses = (address for path in file_paths
+                 for address in iter_addresses(path, workers))
+    with open_sink(format, output) as sink:
+        kept = sink.write_all(dedup.unique(addresses))
+    print(f"{dedup.seen} addresses: {kept} unique, {dedup.exact} exact "
+          f"and {dedup.near} near duplicates", file=sys.stderr)
+
+
+def parse_args(arglist):
+    """ Parse command-line arguments. """
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("files", nargs="+",
+                        help="files containing one address per line")
+    parser.add_argument("--threshold", type=float, default=NEAR_THRESHOLD,
+                        help="street similarity (0-1) for near duplicates;"
+                             " 1 disables them (default: %(default)s)")
+    parser.add_argument("--format", choices=sorted(SINKS), default="repr",
+                        help="output format (default: repr)")
+    parser.add_argument("--output", "-o", help="output file (default: stdout)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of processes to parse with (default: 1)")
+    return parser.parse_args(arglist)
+
+
+if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+    main(args.files, args.threshold, args.format, args.output, args.workers)
@@ -0,0 +1,214 @@
+""" An in-memory index of parsed addresses. """
+from bisect import bisect_left
+import sys
+
+from addresses import iter_addresses
+
+
+class Address:
+    """ A compact, read-only parsed address.
+
+    Field values are interned, so addresses sharing a city, state, zip
+    or street share a single string object.
+
+    Attributes:
+        house_number (str), street (str), city (str), state (str),
+        zip (str): the parts of the address.
+    """
+    __slots__ = ("house_number", "street", "city", "state", "zip")
+
+    def __init__(self, house_number, street, city, state, zip):
+        intern = sys.intern
+        object.__setattr__(self, "house_number", house_number)
+        object.__setattr__(self, "street", intern(street))
+        object.__setattr__(self, "city", intern(city))
+        object.__setattr__(self, "state", intern(state))
+        object.__setattr__(self, "zip", intern(zip))
+
+    @classmethod
+    def from_dict(cls, address):
+        """ Build an Address from a dict returned by parse_address(). """
+        return cls(address["house_number"], address["street"],
+                   address["city"], address["state"], address["zip"])
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Address objects are read-only")
+
+    def as_dict(self):
+        """ Return the address as a dict like parse_address() does. """
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __eq__(self, other):
+        if not isinstance(other, Address):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name)
+                   for name in self.__slots__)
+
+    def __hash__(self):
+        return hash(tuple(getattr(self, name) for name in self.__slots__))
+
+    def __repr__(self):
+        return (f"Address({self.house_number!r}, {self.street!r}, "
+                f"{self.city!r}, {self.state!r}, {self.zip!r})")
+
+    def __str__(self):
+        return (f"{self.house_number} {self.street}, {self.city} "
+                f"{self.state} {self.zip}")
+
+
+class PrefixIndex:
+    """ Case-insensitive prefix search over names via a sorted array.
+
+    Attributes:
+        ids (dict of str: list of int): record ids for each folded name.
+        keys (list of str): the folded names, sorted; rebuilt lazily
+            after names are added.
+    """
+    def __init__(self):
+        self.ids = {}
+        self.keys = []
+        self.dirty = False
+
+    def add(self, name, record_id):
+        """ Index record_id under name. """
+        key = name.casefold()
+        ids = self.ids.get(key)
+        if ids is None:
+            self.ids[key] = [record_id]
+            self.dirty = True
+        else:
+            ids.append(record_id)
+
+    def search(self, prefix):
+        """ Find the record ids of every name starting with prefix.
+
+        Args:
+            prefix (str): the prefix, matched case-insensitively.
+
+        Yields:
+            int: record ids, grouped by name in alphabetical order.
+        """
+        if self.dirty:
+            self.keys = sorted(self.ids)
+            self.dirty = False
+        prefix = prefix.casefold()
+        for i in range(bisect_left(self.keys, prefix), len(self.keys)):
+            key = self.keys[i]
+            if not key.startswith(prefix):
+                break
+            yield from self.ids[key]
+
+
+class AddressIndex:
+    """ Parsed addresses indexed for lookup by zip, state and city, and
+    for prefix search on street and city names.
+
+    Attributes:
+        records (list of Address): every indexed address, by record id.
+        by_zip (dict of str: list of int): record ids per zip code.
+        by_state (dict of str: list of int): record ids per state.
+        by_city (dict of str: list of int): record ids per city name.
+        streets (PrefixIndex): prefix index of street names.
+        cities (PrefixIndex): prefix index of city names.
+    """
+    def __init__(self, addresses=()):
+        self.records = []
+        self.by_zip = {}
+        self.by_state = {}
+        self.by_city = {}
+        self.streets = PrefixIndex()
+        self.cities = PrefixIndex()
+        self.add_all(addresses)
+
+    @classmethod
+    def from_file(cls, file_path, workers=1):
+        """ Parse a file of addresses and index them.
+
+        Args:
+            file_path (str): The path to a file containing one address per line.
+            workers (int): number of processes to parse with.
+
+        Returns:
+            AddressIndex: the index.
+        """
+        return cls(iter_addresses(file_path, workers))
+
+    def __len__(self):
+        return len(self.records)
+
+    def add(self, address):
+        """ Index one address.
+
+        Args:
+            address (dict or Address): a parsed address.
+
+        Returns:
+            Address: the stored record.
+        """
+        if not isinstance(address, Address):
+            address = Address.from_dict(address)
+        record_id = len(self.records)
+        self.records.append(address)
+        self.by_zip.setdefault(address.zip, []).append(record_id)
+        self.by_state.setdefault(address.state, []).append(record_id)
+        self.by_city.setdefault(address.city, []).append(record_id)
+        self.streets.add(address.street, record_id)
+        self.cities.add(address.city, record_id)
+        return address
+
+    def add_all(self, addresses):
+        """ Index every address from an iterable of parsed addresses. """
+        for address in addresses:
+            self.add(address)
+
+    def lookup(self, ids):
+        """ Return the records with the given ids. """
+        return [self.records[i] for i in ids]
+
+    def zip(self, zip_code):
+        """ Return the addresses with a zip code. """
+        return self.lookup(self.by_zip.get(zip_code, ()))
+
+    def state(self, state):
+        """ Return the addresses in a state. """
+        return self.lookup(self.by_state.get(state, ()))
+
+    def city(self, city, state=None):
+        """ Return the addresses in a city.
+
+        Args:
+            city (str): the city name, matched exactly.
+            state (str): the state; if None, matching cities in every
+                state are returned.
+        """
+        records = self.lookup(self.by_city.get(city, ()))
+        if state is not None:
+            records = [r for r in records if r.state == state]
+        return records
+
+    def street_prefix(self, prefix, limit=None):
+        """ Return addresses whose street name starts with prefix.
+
+        Args:
+            prefix (str): the prefix, matched case-insensitively.
+            limit (int): maximum number of addresses (default: all).
+        """
+        return self.prefix_search(self.streets, prefix, limit)
+
+    def city_prefix(self, prefix, limit=None):
+        """ Return addresses whose city name starts with prefix.
+
+        Args:
+            prefix (str): the prefix, matched case-insensitively.
+            limit (int): maximum number of addresses (default: all).
+        """
+        return self.prefix_search(self.cities, prefix, limit)
+
+    def prefix_search(self, index, prefix, limit):
+        """ Return up to limit records found by a PrefixIndex search. """
+        results = []
+        for record_id in index.search(prefix):
+            if limit is not None and len(results) >= limit:
+                break
+            results.append(self.records[record_id])
+        return results
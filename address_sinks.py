@@ -0,0 +1,206 @@
+""" Buffered output sinks for parsed addresses. """
+from abc import ABC, abstractmethod
+import csv
+import json
+import sqlite3
+import sys
+
+# the keys of a parsed address, in output order
+FIELDS = ("house_number", "street", "city", "state", "zip")
+
+# default size in bytes of the write buffer of file-based sinks
+BUFFER_SIZE = 1024 * 1024
+
+# default number of rows per executemany() call of SqliteSink
+SQLITE_BATCH_SIZE = 10_000
+
+
+def open_text(path, buffer_size=BUFFER_SIZE):
+    """ Open a file, or stdout if path is None or "-", for buffered writing.
+
+    Args:
+        path (str): the file to write, or None/"-" for stdout.
+        buffer_size (int): size of the write buffer in bytes.
+
+    Returns:
+        file: a text file object.
+    """
+    if path in (None, "-"):
+        sys.stdout.flush()
+        return open(sys.stdout.fileno(), "w", buffering=buffer_size,
+                    newline="", closefd=False)
+    return open(path, "w", buffering=buffer_size, newline="")
+
+
+class AddressSink(ABC):
+    """ Abstract base class of the address sinks.
+
+    Subclasses must implement write_address() and, if they hold
+    resources, flush() and close().
+
+    Attributes:
+        count (int): number of addresses written.
+        flush_every (int): flush after this many addresses; 0 means only
+            when the buffer fills and on close.
+    """
+    def __init__(self, flush_every=0):
+        self.count = 0
+        self.flush_every = flush_every
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, address):
+        """ Write one parsed address.
+
+        Args:
+            address (dict): an address as returned by parse_address() or
+                a CachedParser.
+        """
+        self.write_address(address)
+        self.count += 1
+        if self.flush_every and self.count % self.flush_every == 0:
+            self.flush()
+
+    def write_all(self, addresses):
+        """ Write every address from an iterable.
+
+        Args:
+            addresses (iterable of dict): parsed addresses.
+
+        Returns:
+            int: the total number of addresses written so far.
+        """
+        for address in addresses:
+            self.write(address)
+        return self.count
+
+    @abstractmethod
+    def write_address(self, address):
+        """ Write one address to the destination, without counting it. """
+
+    def flush(self):
+        """ Push buffered output to its destination. """
+
+    def close(self):
+        """ Flush and release the sink's resources. """
+        self.flush()
+
+
+class FileSink(AddressSink):
+    """ A sink writing text through a large buffer.
+
+    Attributes:
+        file (file): the open output file.
+    """
+    def __init__(self, path=None, buffer_size=BUFFER_SIZE, flush_every=0):
+        super().__init__(flush_every)
+        self.file = open_text(path, buffer_size)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class ReprSink(FileSink):
+    """ Writes the repr of each address dict, one per line. """
+    def write_address(self, address):
+        self.file.write(f"{dict(address)!r}\n")
+
+
+class JsonlSink(FileSink):
+    """ Writes each address as a JSON object on its own line. """
+    def write_address(self, address):
+        self.file.write(json.dumps(dict(address)) + "\n")
+
+
+class CsvSink(FileSink):
+    """ Writes addresses as CSV rows under a header of FIELDS. """
+    def __init__(self, path=None, buffer_size=BUFFER_SIZE, flush_every=0):
+        super().__init__(path, buffer_size, flush_every)
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(FIELDS)
+
+    def write_address(self, address):
+        self.writer.writerow([address[field] for field in FIELDS])
+
+
+class SqliteSink(AddressSink):
+    """ Loads addresses into a SQLite table with batched executemany().
+
+    Attributes:
+        conn (sqlite3.Connection): connection to the output database.
+        table (str): name of the table, created if it does not exist.
+        batch_size (int): number of rows buffered before each insert.
+    """
+    def __init__(self, path, table="addresses", batch_size=SQLITE_BATCH_SIZE,
+                 flush_every=0):
+        super().__init__(flush_every)
+        if not table.isidentifier():
+            raise ValueError(f"invalid table name {table!r}")
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.execute(f"CREATE TABLE IF NOT EXISTS {table}"
+                          f" ({', '.join(f'{f} text' for f in FIELDS)})")
+        self.table = table
+        self.batch_size = batch_size
+        self.insert = (f"INSERT INTO {table} VALUES"
+                       f" ({', '.join('?' * len(FIELDS))})")
+        self.batch = []
+
+    def write_address(self, address):
+        self.batch.append(tuple(address[field] for field in FIELDS))
+        if len(self.batch) >= self.batch_size:
+            self.conn.executemany(self.insert, self.batch)
+            self.batch = []
+
+    def flush(self):
+        """ Insert buffered rows and commit. """
+        if self.batch:
+            self.conn.executemany(self.insert, self.batch)
+            self.batch = []
+        self.conn.commit()
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+
+# sinks selectable by name on the command line
+SINKS = {"repr": ReprSink, "jsonl": JsonlSink, "csv": CsvSink,
+         "sqlite": SqliteSink}
+
+
+def open_sink(format, path=None, buffer_size=BUFFER_SIZE, flush_every=0,
+              batch_size=SQLITE_BATCH_SIZE):
+    """ Create a sink by name.
+
+    Args:
+        format (str): one of the keys of SINKS.
+        path (str): output file, or None for stdout (not for "sqlite").
+        buffer_size (int): write buffer size in bytes for text sinks.
+        flush_every (int): flush after this many addresses (0: never
+            before close).
+        batch_size (int): rows per executemany() call for "sqlite".
+
+    Returns:
+        AddressSink: the sink.
+
+    Raises:
+        ValueError: format is unknown, or "sqlite" was requested without
+            a path.
+    """
+    if format not in SINKS:
+        raise ValueError(f"format should be one of {sorted(SINKS)}")
+    if format == "sqlite":
+        if path in (None, "-"):
+            raise ValueError("the sqlite sink needs an output path")
+        return SqliteSink(path, batch_size=batch_size,
+                          flush_every=flush_every)
+    return SINKS[format](path, buffer_size, flush_every)
@@ -1,6 +1,146 @@
 from argparse import ArgumentParser
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+import heapq
+import os
 import re
 import sys
+import time
+from types import MappingProxyType
+
+from address_sinks import (BUFFER_SIZE, SINKS, SQLITE_BATCH_SIZE,
+                           open_sink)
+
+# Regular expression pattern to match the address components, compiled once
+ADDRESS_PATTERN = re.compile(r'^(?P<house_number>[\w\s]+?)\s(?P<street>[^,]+?),\s(?P<city>[^,]+)\s(?P<state>[A-Z]{2})\s(?P<zip>\d{5})$')
+
+# encoding of address files, whether read serially or in chunks
+ENCODING = "utf-8"
+
+# approximate number of bytes of input handed to a worker at a time
+CHUNK_SIZE = 4 * 1024 * 1024
+
+# default number of lines remembered by CachedParser
+PARSE_CACHE_SIZE = 65536
+
+# number of parse-time histogram buckets; bucket i counts lines that took
+# less than 2**i microseconds (and at least 2**(i-1)), the last is open-ended
+HISTOGRAM_BUCKETS = 24
+
+class ParseStats:
+    """
+    Counters and timings collected while parsing a file of addresses.
+
+    Attributes:
+        lines_read (int): number of lines parsed.
+        matched (int): number of lines that parsed as an address.
+        rejected (int): number of lines that did not.
+        histogram (list of int): parse-time histogram (see HISTOGRAM_BUCKETS).
+        slowest (list of (float, int, str)): heap of the slowest lines as
+            (seconds, line number, line), at most keep_slowest long.
+        keep_slowest (int): number of slowest lines to keep.
+        rejects (file): open text file that rejected lines are written to
+            as "line number<TAB>line", or None.
+        rejected_lines (list of (int, str)): rejected lines kept in memory
+            when keep_rejects is True, e.g. in worker processes.
+        seconds (float): wall-clock time from creation to finish().
+    """
+    def __init__(self, keep_slowest=10, rejects=None, keep_rejects=False):
+        self.lines_read = 0
+        self.matched = 0
+        self.rejected = 0
+        self.histogram = [0] * HISTOGRAM_BUCKETS
+        self.slowest = []
+        self.keep_slowest = keep_slowest
+        self.rejects = rejects
+        self.keep_rejects = keep_rejects
+        self.rejected_lines = []
+        self.start = time.perf_counter()
+        self.seconds = None
+
+    def record(self, line_number, line, seconds, matched):
+        """
+        Record the outcome of parsing one line.
+
+        Args:
+            line_number (int): 1-based number of the line in its file.
+            line (str): the line, stripped.
+            seconds (float): time taken by parse_address().
+            matched (bool): whether the line parsed as an address.
+        """
+        self.lines_read += 1
+        bucket = min(int(seconds * 1e6).bit_length(), HISTOGRAM_BUCKETS - 1)
+        self.histogram[bucket] += 1
+        if len(self.slowest) < self.keep_slowest:
+            heapq.heappush(self.slowest, (seconds, line_number, line))
+        elif self.slowest and seconds > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (seconds, line_number, line))
+        if matched:
+            self.matched += 1
+        else:
+            self.reject(line_number, line)
+
+    def reject(self, line_number, line):
+        """ Count a rejected line and send it to the reject channel. """
+        self.rejected += 1
+        if self.rejects is not None:
+            self.rejects.write(f"{line_number}\t{line}\n")
+        if self.keep_rejects:
+            self.rejected_lines.append((line_number, line))
+
+    def merge(self, other, line_offset=0):
+        """
+        Add the statistics of a chunk parsed elsewhere.
+
+        Args:
+            other (ParseStats): statistics of the chunk, created with
+                keep_rejects=True.
+            line_offset (int): number of lines before the chunk, added to
+                its line numbers.
+        """
+        self.lines_read += other.lines_read
+        self.matched += other.matched
+        self.histogram = [a + b for a, b in zip(self.histogram, other.histogram)]
+        for seconds, line_number, line in other.slowest:
+            entry = (seconds, line_number + line_offset, line)
+            if len(self.slowest) < self.keep_slowest:
+                heapq.heappush(self.slowest, entry)
+            elif self.slowest and seconds > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, entry)
+        for line_number, line in other.rejected_lines:
+            self.reject(line_number + line_offset, line)
+
+    def finish(self):
+        """ Stop the clock used for lines per second. """
+        self.seconds = time.perf_counter() - self.start
+
+    def summary(self):
+        """
+        Describe the statistics for people.
+
+        Returns:
+            str: match rate, throughput, histogram and slowest lines.
+        """
+        seconds = self.seconds
+        if seconds is None:
+            seconds = time.perf_counter() - self.start
+        rate = self.lines_read / seconds if seconds else float("inf")
+        percent = 100 * self.matched / self.lines_read if self.lines_read else 0
+        lines = [f"Read {self.lines_read} lines in {seconds:.3f}s "
+                 f"({rate:,.0f} lines/sec): {self.matched} matched "
+                 f"({percent:.1f}%), {self.rejected} rejected",
+                 "Parse time histogram:"]
+        for bucket, count in enumerate(self.histogram):
+            if count:
+                low = 0 if bucket == 0 else 2 ** (bucket - 1)
+                high = ("" if bucket == HISTOGRAM_BUCKETS - 1
+                        else f"{2 ** bucket}")
+                lines.append(f"  {low:>8}-{high:<8} us: {count}")
+        lines.append("Slowest lines:")
+        for seconds, line_number, line in sorted(self.slowest, reverse=True):
+            lines.append(f"  {seconds * 1e6:10.1f} us  line {line_number}: "
+                         f"{line!r}")
+        return "\n".join(lines)
 
 def parse_address(address_text):
     """
@@ -19,16 +159,123 @@ def parse_address(address_text):
 
     If the regular expression was unsuccessful, return None.
     """
-    # Regular expression pattern to match the address components
-    address_pattern = r'^(?P<house_number>[\w\s]+?)\s(?P<street>[^,]+?),\s(?P<city>[^,]+)\s(?P<state>[A-Z]{2})\s(?P<zip>\d{5})$'
-    
-    match = re.search(address_pattern, address_text)
-    
+    match = ADDRESS_PATTERN.match(address_text)
+
     if match:
         return match.groupdict()
     else:
         return None
 
+class CachedParser:
+    """
+    parse_address() behind a bounded least-recently-used cache.
+
+    Results are keyed on the stripped line and returned as read-only
+    mappings, since the same object is handed out for every repeat of
+    a line. Lines that do not parse are cached too.
+
+    Attributes:
+        maxsize (int): maximum number of lines remembered.
+        hits (int): number of lines answered from the cache.
+        misses (int): number of lines that had to be parsed.
+        evictions (int): number of entries dropped to stay within maxsize.
+    """
+    def __init__(self, maxsize=PARSE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __call__(self, address_text):
+        """
+        Parse a line, using the cached result if the line was seen recently.
+
+        Args:
+            address_text (str): A single line of text containing a US street address.
+
+        Returns:
+            MappingProxyType: the parts of the address (see
+            parse_address()), or None if the line is not an address.
+        """
+        entries = self.entries
+        try:
+            result = entries[address_text]
+        except KeyError:
+            self.misses += 1
+            result = parse_address(address_text)
+            if result is not None:
+                result = MappingProxyType(result)
+            entries[address_text] = result
+            if len(entries) > self.maxsize:
+                entries.popitem(last=False)
+                self.evictions += 1
+            return result
+        entries.move_to_end(address_text)
+        self.hits += 1
+        return result
+
+    def counters(self):
+        """ Return the hit, miss and eviction counts and the cache size. """
+        return {"hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "size": len(self.entries)}
+
+    def add_counts(self, counts):
+        """ Add hit, miss and eviction counts gathered by another parser,
+        e.g. in a worker process. """
+        self.hits += counts["hits"]
+        self.misses += counts["misses"]
+        self.evictions += counts["evictions"]
+
+# the CachedParser of a worker process, kept across chunks
+worker_parser = None
+
+def get_worker_parser(cache_size):
+    """ Return this process's CachedParser, creating it if needed. """
+    global worker_parser
+    if worker_parser is None or worker_parser.maxsize != cache_size:
+        worker_parser = CachedParser(cache_size)
+    return worker_parser
+
+def iter_addresses(file_path, workers=1, chunk_size=CHUNK_SIZE, stats=None,
+                   parser=None):
+    """
+    Parse US street addresses from a file one line at a time.
+
+    Args:
+        file_path (str): The path to a file containing one address per line.
+        workers (int): number of processes to parse with. With more than
+            one, the file is split into chunks (see iter_addresses_parallel()).
+        chunk_size (int): approximate size in bytes of each chunk.
+        stats (ParseStats): if given, every line is timed and recorded in it.
+        parser (CachedParser): if given, lines are parsed through this
+            cache. With several workers each worker process keeps its own
+            cache of the same size, and their counts are added to parser.
+
+    Yields:
+        dict: each successfully parsed address, in file order.
+    """
+    if workers > 1:
+        yield from iter_addresses_parallel(file_path, workers, chunk_size,
+                                           stats, parser)
+        return
+    parse = parse_address if parser is None else parser
+    with open(file_path, 'r', encoding=ENCODING) as file:
+        if stats is None:
+            for line in file:
+                address = parse(line.strip())
+                if address:
+                    yield address
+            return
+        for line_number, line in enumerate(file, 1):
+            text = line.strip()
+            start = time.perf_counter()
+            address = parse(text)
+            stats.record(line_number, text, time.perf_counter() - start,
+                         address is not None)
+            if address:
+                yield address
+
 def parse_addresses(file_path):
     """
     Parse US street addresses from a file and return a list of dictionaries.
@@ -41,24 +288,252 @@ def parse_addresses(file_path):
 
     The file should contain one address per line.
     """
+    return list(iter_addresses(file_path))
+
+def find_chunks(file_path, chunk_size=CHUNK_SIZE):
+    """
+    Split a file into byte ranges that begin and end on line boundaries.
+
+    Args:
+        file_path (str): The path to a file containing one address per line.
+        chunk_size (int): approximate size in bytes of each range.
+
+    Yields:
+        tuple of (int, int): start and end offsets of each range.
+    """
+    size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as file:
+        start = 0
+        while start < size:
+            file.seek(min(start + chunk_size, size))
+            file.readline()  # finish the line the boundary fell in
+            end = min(file.tell(), size)
+            yield start, end
+            start = end
+
+def read_chunk_lines(file_path, start, end):
+    """
+    Read the lines in a byte range of a file.
+
+    Lines end at "\n", "\r\n" or "\r", like a file opened in text mode.
+    Range boundaries from find_chunks() always fall after a "\n", so no
+    line ending is split between ranges.
+
+    Args:
+        file_path (str): The path to the file.
+        start (int): offset of the first byte of the range.
+        end (int): offset just past the last byte of the range.
+
+    Returns:
+        list of str: the lines in the range, without line endings.
+    """
+    with open(file_path, 'rb') as file:
+        file.seek(start)
+        text = file.read(end - start).decode(ENCODING)
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    lines = text.split("\n")
+    if text.endswith("\n"):
+        lines.pop()
+    return lines
+
+def parse_chunk(file_path, start, end, collect_stats=False, cache_size=0,
+                keep_slowest=10):
+    """
+    Parse the addresses in a byte range of a file. Runs in a worker process.
+
+    Args:
+        file_path (str): The path to a file containing one address per line.
+        start (int): offset of the first byte of the range.
+        end (int): offset just past the last byte of the range.
+        collect_stats (bool): if True, time and record every line.
+        cache_size (int): if non-zero, parse through this process's
+            CachedParser of this size.
+        keep_slowest (int): number of slowest lines to keep in the stats.
+
+    Returns:
+        tuple of (list, ParseStats, dict): the successfully parsed
+        addresses in the range, in order; their statistics (None unless
+        collect_stats), with line numbers counted from the chunk start;
+        and the cache's hit, miss and eviction counts for this chunk
+        (None without a cache).
+    """
+    parse = parse_address
+    if cache_size:
+        parser = get_worker_parser(cache_size)
+        before = parser.counters()
+
+        def parse(text):
+            # cached results are read-only mappings, which cannot be
+            # pickled back to the parent process
+            address = parser(text)
+            return None if address is None else dict(address)
+
     addresses = []
-    
-    with open(file_path, 'r') as file:
-        for line in file:
-            address = parse_address(line.strip())
+    stats = None
+    if not collect_stats:
+        for line in read_chunk_lines(file_path, start, end):
+            address = parse(line.strip())
             if address:
                 addresses.append(address)
-    
-    return addresses
+    else:
+        stats = ParseStats(keep_slowest, keep_rejects=True)
+        for line_number, line in enumerate(
+                read_chunk_lines(file_path, start, end), 1):
+            text = line.strip()
+            t0 = time.perf_counter()
+            address = parse(text)
+            stats.record(line_number, text, time.perf_counter() - t0,
+                         address is not None)
+            if address:
+                addresses.append(address)
+
+    counts = None
+    if cache_size:
+        after = parser.counters()
+        counts = {key: after[key] - before[key]
+                  for key in ("hits", "misses", "evictions")}
+    return addresses, stats, counts
+
+def iter_addresses_parallel(file_path, workers, chunk_size=CHUNK_SIZE,
+                            stats=None, parser=None):
+    """
+    Parse US street addresses from a file in a pool of processes.
+
+    The file is split into chunks on line boundaries. At most two chunks
+    per worker are in flight at once, so memory use is bounded no matter
+    how large the file is, and results are yielded in input order.
+
+    Args:
+        file_path (str): The path to a file containing one address per line.
+        workers (int): number of worker processes.
+        chunk_size (int): approximate size in bytes of each chunk.
+        stats (ParseStats): if given, chunk statistics are merged into it.
+        parser (CachedParser): if given, each worker parses through its own
+            cache of the same size, and cache counts are added to parser.
+
+    Yields:
+        dict: each successfully parsed address, in file order.
+    """
+    lines_before = 0
+
+    def collect(future):
+        nonlocal lines_before
+        addresses, chunk_stats, cache_counts = future.result()
+        if parser is not None:
+            parser.add_counts(cache_counts)
+        if stats is not None:
+            stats.merge(chunk_stats, lines_before)
+            lines_before += chunk_stats.lines_read
+        return addresses
+
+    with ProcessPoolExecutor(workers) as executor:
+        pending = deque()
+        for start, end in find_chunks(file_path, chunk_size):
+            pending.append(executor.submit(
+                parse_chunk, file_path, start, end, stats is not None,
+                0 if parser is None else parser.maxsize,
+                10 if stats is None else stats.keep_slowest))
+            if len(pending) >= 2 * workers:
+                yield from collect(pending.popleft())
+        while pending:
+            yield from collect(pending.popleft())
+
+def main(file_path, workers=1, format="repr", output=None,
+         buffer_size=BUFFER_SIZE, flush_every=0,
+         batch_size=SQLITE_BATCH_SIZE, summary=False, stats=False,
+         rejects=None, slowest=10, cache_size=0):
+    """
+    Write each address parsed from a file to a sink as soon as it is parsed.
+
+    Args:
+        file_path (str): The path to a file containing one address per line.
+        workers (int): number of processes to parse with.
+        format (str): output format, one of address_sinks.SINKS.
+        output (str): output file, or None for stdout.
+        buffer_size (int): write buffer size in bytes.
+        flush_every (int): flush the sink after this many addresses.
+        batch_size (int): rows per insert for the sqlite sink.
+        summary (bool): if True, report end-to-end throughput on stderr.
+        stats (bool): if True, collect ParseStats and print them on stderr.
+        rejects (str): path of a file to write rejected lines to, with
+            their line numbers. Implies collecting statistics.
+        slowest (int): number of slowest lines to report.
+        cache_size (int): if non-zero, parse through a CachedParser of this
+            size and report its counters with summary or stats.
+
+    Side effects:
+        Writes to stdout or output, to rejects if given, and to stderr if
+        summary or stats is True.
+    """
+    start = time.perf_counter()
+    parse_stats = None
+    rejects_file = None
+    if stats or rejects:
+        if rejects:
+            rejects_file = open(rejects, "w", buffering=buffer_size)
+        parse_stats = ParseStats(slowest, rejects_file)
+    parser = CachedParser(cache_size) if cache_size else None
+    try:
+        with open_sink(format, output, buffer_size, flush_every,
+                       batch_size) as sink:
+            count = sink.write_all(iter_addresses(file_path, workers,
+                                                  stats=parse_stats,
+                                                  parser=parser))
+    finally:
+        if rejects_file is not None:
+            rejects_file.close()
+    if parse_stats is not None:
+        parse_stats.finish()
+        if stats:
+            print(parse_stats.summary(), file=sys.stderr)
+    if summary:
+        seconds = time.perf_counter() - start
+        rate = count / seconds if seconds else float("inf")
+        print(f"Wrote {count} addresses in {seconds:.3f}s "
+              f"({rate:,.0f} addresses/sec)", file=sys.stderr)
+    if parser is not None and (summary or stats):
+        c = parser.counters()
+        lookups = c["hits"] + c["misses"]
+        percent = 100 * c["hits"] / lookups if lookups else 0
+        print(f"Parse cache: {c['hits']} hits ({percent:.1f}%), "
+              f"{c['misses']} misses, {c['evictions']} evictions",
+              file=sys.stderr)
 
 def parse_args(arglist):
     """ Parse command-line arguments. """
     parser = ArgumentParser()
     parser.add_argument("file", help="File containing one address per line")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of processes to parse with (default: 1)")
+    parser.add_argument("--format", choices=sorted(SINKS), default="repr",
+                        help="output format (default: repr)")
+    parser.add_argument("--output", "-o",
+                        help="output file (default: stdout; required for"
+                             " sqlite)")
+    parser.add_argument("--buffer-size", type=int, default=BUFFER_SIZE,
+                        help="write buffer size in bytes")
+    parser.add_argument("--flush-every", type=int, default=0,
+                        help="flush output after this many addresses"
+                             " (default: only when the buffer fills)")
+    parser.add_argument("--batch-size", type=int, default=SQLITE_BATCH_SIZE,
+                        help="rows per insert for the sqlite format")
+    parser.add_argument("--summary", action="store_true",
+                        help="print end-to-end throughput to stderr")
+    parser.add_argument("--stats", action="store_true",
+                        help="print match rate, lines/sec, a parse-time"
+                             " histogram and the slowest lines to stderr")
+    parser.add_argument("--rejects", metavar="PATH",
+                        help="write lines that are not addresses, with their"
+                             " line numbers, to PATH")
+    parser.add_argument("--slowest", type=int, default=10,
+                        help="number of slowest lines to report (default: 10)")
+    parser.add_argument("--cache-size", type=int, default=0,
+                        help="remember this many recent lines and reuse their"
+                             " parse results (default: 0, no cache)")
     return parser.parse_args(arglist)
 
 if __name__ == "__main__":
     args = parse_args(sys.argv[1:])
-    for address in parse_addresses(args.file):
-        print(address)
-
+    main(args.file, args.workers, args.format, args.output, args.buffer_size,
+         args.flush_every, args.batch_size, args.summary, args.stats,
+         args.rejects, args.slowest, args.cache_size)
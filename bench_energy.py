@@ -0,0 +1,309 @@
+""" Benchmarks and synthetic data for the EnergyDB storage backends. """
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+import csv
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import sqlite3
+import sys
+import time
+
+from energy import BACKENDS, EnergyDB
+
+# default dataset sizes, as multiples of the bundled energy.csv
+SCALES = (1, 10, 100, 1000)
+
+TEMPLATE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        "energy.csv")
+
+
+def time_calls(func, calls):
+    """ Time a function over a list of argument tuples.
+
+    Args:
+        func (callable): the function to call.
+        calls (list of tuple): positional arguments for each call.
+
+    Returns:
+        tuple of (list, float): the results of each call and the total
+        number of seconds taken.
+    """
+    start = time.perf_counter()
+    results = [func(*args) for args in calls]
+    return results, time.perf_counter() - start
+
+
+def percentiles(samples, points=(50, 99)):
+    """ Compute percentiles of a list of samples (nearest-rank method).
+
+    Args:
+        samples (list of float): the samples.
+        points (tuple of int): the percentiles to compute.
+
+    Returns:
+        dict of str: float: e.g. {"p50": ..., "p99": ...}.
+    """
+    ordered = sorted(samples)
+    result = {}
+    for p in points:
+        rank = max(1, -(-p * len(ordered) // 100))
+        result[f"p{p}"] = ordered[rank - 1]
+    return result
+
+
+def generate_dataset(path, scale=1, seed=0, template=TEMPLATE):
+    """ Write a synthetic CSV file shaped like energy.csv.
+
+    The years, sources and states of the template are reused as they
+    are, so the number of distinct names stays fixed at any scale. Each
+    (year, state, source) cell is present with the template's density,
+    and at scale N a present cell has N rows (as if reported by N
+    plants), so the file has about N times as many rows. MWh values
+    follow a log-normal distribution.
+
+    Args:
+        path (str): the file to write.
+        scale (int): size relative to the template.
+        seed (int): random seed, for reproducible files.
+        template (str): an energy CSV file to take the shape from.
+
+    Returns:
+        int: the number of rows written.
+    """
+    with open(template, newline="") as file:
+        reader = csv.reader(file)
+        header = next(reader)
+        template_rows = [(int(year), state, source)
+                         for year, state, source, _ in reader]
+    years = sorted({r[0] for r in template_rows})
+    states = sorted({r[1] for r in template_rows})
+    sources = sorted({r[2] for r in template_rows})
+    density = len(template_rows) / (len(years) * len(states) * len(sources))
+
+    rng = random.Random(seed)
+    rows = 0
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(header)
+        for year in years:
+            cells = [(state, source) for state in states
+                     for source in sources if rng.random() < density]
+            for _ in range(scale):
+                for state, source in cells:
+                    mwh = round(rng.lognormvariate(13, 2), 1)
+                    writer.writerow((year, state, source, mwh))
+                    rows += 1
+    return rows
+
+
+def data_size(e):
+    """ Estimate the in-memory size of a loaded EnergyDB in bytes. """
+    if e.columns is not None:
+        c = e.columns
+        return c.year.nbytes + c.state.nbytes + c.source.nbytes + c.mwh.nbytes
+    page_count = e.conn.execute("PRAGMA page_count").fetchone()[0]
+    page_size = e.conn.execute("PRAGMA page_size").fetchone()[0]
+    return page_count * page_size
+
+
+def run_benchmark(filename, backend, queries=1000, seed=0):
+    """ Load a CSV file into one backend and measure it.
+
+    Meant to run in a fresh process so that peak RSS reflects this
+    backend alone (see run_suite()).
+
+    Args:
+        filename (str): path to an energy CSV file.
+        backend (str): the EnergyDB backend.
+        queries (int): number of timed calls of each query type.
+        seed (int): random seed for choosing query arguments.
+
+    Returns:
+        dict: rows, load time, rows/sec, data size, peak RSS and p50/p99
+        latencies in seconds of production_by_source() ("by_source") and
+        of a grouped production_matrix() over one year ("grouped").
+    """
+    e = EnergyDB(filename, backend=backend)
+    keys = sorted(e.production_matrix())
+    years = sorted({year for _, year in keys})
+
+    rng = random.Random(seed)
+    latencies = {"by_source": [], "grouped": []}
+    for _ in range(queries):
+        source, year = rng.choice(keys)
+        start = time.perf_counter()
+        e.production_by_source(source, year)
+        latencies["by_source"].append(time.perf_counter() - start)
+
+        year = rng.choice(years)
+        start = time.perf_counter()
+        e.production_matrix(years=[year], by_state=True)
+        latencies["grouped"].append(time.perf_counter() - start)
+
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != "darwin":
+        maxrss *= 1024
+    return {
+        "backend": backend,
+        "rows": e.load_report["rows"],
+        "load_seconds": e.load_report["seconds"],
+        "rows_per_sec": e.load_report["rows_per_sec"],
+        "data_bytes": data_size(e),
+        "peak_rss_bytes": maxrss,
+        "latency_seconds": {name: percentiles(samples)
+                            for name, samples in latencies.items()},
+    }
+
+
+def run_suite(data_dir, scales=SCALES, backends=BACKENDS, queries=1000,
+              seed=0, label=None):
+    """ Generate datasets at several scales and benchmark each backend.
+
+    Datasets already present in data_dir are reused. Each measurement
+    runs in a freshly spawned process.
+
+    Args:
+        data_dir (str): directory for the generated CSV files.
+        scales (tuple of int): dataset sizes relative to energy.csv.
+        backends (tuple of str): the backends to measure.
+        queries (int): number of timed calls of each query type.
+        seed (int): random seed for data and queries.
+        label (str): free-form tag identifying the version under test.
+
+    Returns:
+        dict: environment details and a list of results, one per scale
+        and backend (see run_benchmark()).
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for scale in scales:
+        path = os.path.join(data_dir, f"energy-x{scale}.csv")
+        if not os.path.exists(path):
+            generate_dataset(path, scale, seed)
+        for backend in backends:
+            with ProcessPoolExecutor(1, mp_context=context) as executor:
+                result = executor.submit(run_benchmark, path, backend,
+                                         queries, seed).result()
+            result["scale"] = scale
+            results.append(result)
+    return {
+        "label": label,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "queries": queries,
+        "results": results,
+    }
+
+
+def compare_backends(filename, backends=BACKENDS):
+    """ Load a CSV file into each backend and time the same queries.
+
+    Every (source, year) pair in the data is queried with
+    production_by_source(), then all totals are computed at once with
+    production_matrix().
+
+    Args:
+        filename (str): path to an energy CSV file.
+        backends (tuple of str): the backends to compare.
+
+    Returns:
+        dict of str: dict: per backend, the load time, time for all
+        production_by_source() calls and time for one production_matrix().
+
+    Raises:
+        AssertionError: the backends disagree on a total.
+    """
+    timings = {}
+    expected = None
+    for backend in backends:
+        e = EnergyDB(filename, backend=backend)
+        matrix, matrix_seconds = time_calls(e.production_matrix, [()])
+        calls = sorted(matrix[0])
+        totals, query_seconds = time_calls(e.production_by_source, calls)
+        if expected is None:
+            expected = totals
+        else:
+            for want, got in zip(expected, totals):
+                assert abs(want - got) <= 1e-9 * max(abs(want), 1.0), \
+                    f"{backend} disagrees: {got} != {want}"
+        timings[backend] = {
+            "load_seconds": e.load_report["seconds"],
+            "queries": len(calls),
+            "production_by_source_seconds": query_seconds,
+            "production_matrix_seconds": matrix_seconds,
+        }
+    return timings
+
+
+def main(args):
+    """ Run the subcommand selected on the command line.
+
+    Args:
+        args (argparse.Namespace): parsed arguments (see parse_args()).
+
+    Side effects:
+        Writes to stdout, and writes files for "generate" and, with
+        --output, for "run".
+    """
+    if args.command == "compare":
+        for backend, t in compare_backends(args.file).items():
+            print(f"{backend:>8}: load {t['load_seconds']:.4f}s, "
+                  f"{t['queries']} x production_by_source "
+                  f"{t['production_by_source_seconds']:.4f}s, "
+                  f"production_matrix {t['production_matrix_seconds']:.4f}s")
+    elif args.command == "generate":
+        rows = generate_dataset(args.output, args.scale, args.seed)
+        print(f"Wrote {rows} rows to {args.output}")
+    else:
+        report = run_suite(args.data_dir, args.scales, args.backends,
+                           args.queries, args.seed, args.label)
+        text = json.dumps(report, indent=2)
+        if args.output:
+            with open(args.output, "w") as file:
+                file.write(text + "\n")
+        else:
+            print(text)
+
+
+def parse_args(arglist):
+    """ Parse command-line arguments. """
+    parser = ArgumentParser(description=__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    compare = commands.add_parser(
+        "compare", help="time both backends on one CSV file")
+    compare.add_argument("file", help="path to energy CSV file")
+
+    generate = commands.add_parser(
+        "generate", help="write a synthetic energy CSV file")
+    generate.add_argument("output", help="path of the CSV file to write")
+    generate.add_argument("--scale", type=int, default=1,
+                          help="size relative to energy.csv (default: 1)")
+    generate.add_argument("--seed", type=int, default=0)
+
+    run = commands.add_parser(
+        "run", help="benchmark every backend at several scales")
+    run.add_argument("--data-dir", default="bench_data",
+                     help="directory for generated datasets")
+    run.add_argument("--scales", type=int, nargs="+", default=SCALES)
+    run.add_argument("--backends", nargs="+", choices=BACKENDS,
+                     default=BACKENDS)
+    run.add_argument("--queries", type=int, default=1000,
+                     help="timed calls per query type (default: 1000)")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--label", help="tag for the version under test")
+    run.add_argument("--output", help="write JSON results here"
+                                      " instead of stdout")
+    return parser.parse_args(arglist)
+
+
+if __name__ == "__main__":
+    main(parse_args(sys.argv[1:]))
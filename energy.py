@@ -1,35 +1,1055 @@
 from argparse import ArgumentParser
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import csv
+import glob
+import hashlib
+import io
+from itertools import islice
+import json
+import mmap
+import os
+from queue import Queue
 import sqlite3
+import struct
 import sys
+import time
+import uuid
+
+try:
+    import numpy as np
+except ImportError:  # the numpy backend is optional
+    np = None
+
+# storage engines EnergyDB can be constructed with
+BACKENDS = ("sqlite", "numpy")
+
+# header of the binary column format: magic, version, number of rows and
+# length of the JSON string dictionary that follows it
+BINARY_MAGIC = b"EDBC"
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct("<4sIQQ")
+
+# number of analytics results kept by each EnergyDB
+RESULT_CACHE_SIZE = 256
+
+# number of rows handed to executemany() at a time while loading
+BATCH_SIZE = 50_000
+
+# pragmas applied before a bulk load; the database is rebuilt from the CSV
+# file on failure, so durability can be traded for speed
+LOAD_PRAGMAS = (
+    "PRAGMA journal_mode = OFF",
+    "PRAGMA synchronous = OFF",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -65536",
+)
+
+# composite index serving lookups and GROUP BYs on source, then year
+PRODUCTION_INDEX = """
+    CREATE INDEX IF NOT EXISTS production_source_year_state
+    ON production (source, year, state, mwh)
+"""
+
+
+def source_key(filename, size=None):
+    """ Describe the loaded part of a CSV file for validating an on-disk
+    snapshot of it.
+
+    Args:
+        filename (str): path to the CSV file.
+        size (int): number of bytes that were loaded (default: the whole
+            file); rows appended after them are not described.
+
+    Returns:
+        dict: the file's absolute path, the size in bytes, the file's
+        modification time in nanoseconds and the SHA-256 hex digest of
+        its first size bytes.
+    """
+    st = os.stat(filename)
+    if size is None:
+        size = st.st_size
+    digest = hashlib.sha256()
+    with open(filename, "rb") as file:
+        remaining = size
+        while remaining > 0:
+            chunk = file.read(min(remaining, 1 << 20))
+            if not chunk:
+                break
+            digest.update(chunk)
+            remaining -= len(chunk)
+    return {"path": os.path.abspath(filename), "size": size,
+            "mtime_ns": st.st_mtime_ns, "sha256": digest.hexdigest()}
+
+
+def snapshot_offset(cache, filename):
+    """ Check whether a snapshot file was built from the current CSV file.
+
+    The snapshot records how many bytes of the file it holds. It is valid
+    if the file still starts with exactly those bytes and holds no
+    complete line after them (only a line still being written). The path,
+    size and modification time are compared first; the content hash is
+    only recomputed when they do not settle it (e.g. the file was touched
+    or copied, or has a partial last line).
+
+    Args:
+        cache (str): path to a snapshot written by EnergyDB.
+        filename (str): path to the CSV file.
+
+    Returns:
+        int: the byte offset up to which the snapshot holds the file, to
+        resume refresh() from, or None if the snapshot cannot be used.
+    """
+    if not os.path.exists(cache):
+        return None
+    try:
+        snap = sqlite3.connect(f"file:{cache}?mode=ro", uri=True)
+        try:
+            row = snap.execute("SELECT path, size, mtime_ns, sha256"
+                               " FROM source_meta").fetchone()
+        finally:
+            snap.close()
+    except sqlite3.DatabaseError:
+        return None
+    if row is None:
+        return None
+    path, size, mtime_ns, sha256 = row
+    st = os.stat(filename)
+    if path != os.path.abspath(filename) or size > st.st_size:
+        return None
+    if size == st.st_size and mtime_ns == st.st_mtime_ns:
+        return size
+    with open(filename, "rb") as file:
+        file.seek(size)
+        if complete_lines_end(file) != size:
+            return None
+    if sha256 != source_key(filename, size)["sha256"]:
+        return None
+    return size
+
+
+def make_load_report(rows, start, source):
+    """ Summarize a load for EnergyDB.load_report.
+
+    Args:
+        rows (int): number of rows loaded.
+        start (float): time.perf_counter() value when the load began.
+        source (str): where the rows came from, e.g. "csv" or "cache".
+
+    Returns:
+        dict: rows, seconds, rows_per_sec and source of the load.
+    """
+    seconds = time.perf_counter() - start
+    return {
+        "rows": rows,
+        "seconds": seconds,
+        "rows_per_sec": rows / seconds if seconds else float("inf"),
+        "source": source,
+    }
+
+
+def query_production_by_source(conn, source, year):
+    """ Calculate the total production by source and year in SQL.
+
+    Args:
+        conn (sqlite3.Connection): a connection to a production table.
+        source (str): The energy source name.
+        year (int): The year for which to calculate the total production.
+
+    Returns:
+        float: The total energy production in megawatt hours (MWh).
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT SUM(mwh) FROM production WHERE source=? AND year=?",
+                   (source, year))
+    total_mwh = cursor.fetchone()[0]
+    return total_mwh
+
+
+def query_production_matrix(conn, sources=None, years=None, states=None,
+                            by_state=False):
+    """ Calculate production totals with a single GROUP BY query.
+
+    Args:
+        conn (sqlite3.Connection): a connection to a production table.
+        sources, years, states, by_state: see EnergyDB.production_matrix().
+
+    Returns:
+        dict: see EnergyDB.production_matrix().
+    """
+    groups = "source, year, state" if by_state else "source, year"
+    where = []
+    params = []
+    for column, values in (("source", sources), ("year", years),
+                           ("state", states)):
+        if values is not None:
+            values = list(values)
+            where.append(f"{column} IN ({','.join('?' * len(values))})")
+            params.extend(values)
+    query = f"SELECT {groups}, SUM(mwh) FROM production"
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    query += f" GROUP BY {groups}"
+
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    return {tuple(row[:-1]): row[-1] for row in cursor}
+
+
+def expand_paths(filename):
+    """ Turn a filename, glob pattern or list of filenames into a list.
+
+    Args:
+        filename (str or list of str): a CSV file, a glob pattern such as
+            "data/energy-*.csv", or a list of either.
+
+    Returns:
+        list of str: the matching files; glob matches are sorted.
+
+    Raises:
+        FileNotFoundError: a glob pattern or list matched no files.
+    """
+    names = [filename] if isinstance(filename, str) else filename
+    paths = []
+    for name in names:
+        if any(c in name for c in "*?["):
+            paths.extend(sorted(glob.glob(name)))
+        else:
+            paths.append(name)
+    if not paths:
+        raise FileNotFoundError(f"no CSV files match {filename!r}")
+    return paths
+
+
+def parse_shard(filename):
+    """ Parse a whole CSV shard into compact columns.
+
+    Runs in a worker process. State and source names are interned so
+    that each distinct name is pickled only once on the way back.
+
+    Args:
+        filename (str): path to the shard.
+
+    Returns:
+        dict: the shard's file name, header line, number of rows, parse
+        time in seconds, and columns as (array of year, list of state,
+        list of source, array of MWh).
+
+    Raises:
+        ValueError: the header does not have the four columns year,
+            state, source and MWh, or a row cannot be parsed; the message
+            names the file and line.
+    """
+    start = time.perf_counter()
+    years = array("h")
+    states = []
+    sources = []
+    mwhs = array("d")
+    with open(filename, "r", newline="") as file:
+        header = file.readline().rstrip("\r\n")
+        columns = next(csv.reader([header]), [])
+        if len(columns) != 4:
+            raise ValueError(
+                f"{filename}, line 1: header has {len(columns)} columns,"
+                " expected 4 (year, state, source, MWh)")
+        reader = csv.reader(file)
+        try:
+            for year, state, source, mwh in reader:
+                years.append(int(year))
+                states.append(sys.intern(state))
+                sources.append(sys.intern(source))
+                mwhs.append(float(mwh))
+        except ValueError as e:
+            # line_num counts lines after the header
+            raise ValueError(
+                f"{filename}, line {reader.line_num + 1}: {e}") from None
+    return {"file": filename, "header": header, "rows": len(years),
+            "seconds": time.perf_counter() - start,
+            "columns": (years, states, sources, mwhs)}
+
+
+def is_binary(filename):
+    """ Return True if filename is in the binary column format. """
+    with open(filename, "rb") as file:
+        return file.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+
+
+def write_binary(path, year, state, source, mwh, states, sources):
+    """ Write energy data in the binary column format.
+
+    The file holds a fixed header (BINARY_HEADER), a JSON dictionary of
+    state and source names padded to 8 bytes, then four fixed-width
+    little-endian columns: float64 MWh, int16 year, and the state and
+    source codes, which are int16 unless there are too many names (the
+    type is recorded in the dictionary as "codes"). Every column starts
+    at an offset aligned for its type, so readers can map it without
+    copying.
+
+    The file is written under a temporary name and moved into place, so
+    a file that is currently mapped (e.g. by the store being exported)
+    is never truncated under its readers.
+
+    Args:
+        path (str): the file to write.
+        year (buffer of int16): year of each row, e.g. array("h") or a
+            numpy array.
+        state, source (buffer of int): name codes of each row; converted
+            to the code type if needed.
+        mwh (buffer of float64): production of each row in MWh.
+        states (list of str): state names, indexed by state code.
+        sources (list of str): source names, indexed by source code.
+
+    Side effects:
+        Creates or replaces the file at path.
+    """
+    if sys.byteorder != "little":
+        raise ValueError("the binary format requires a little-endian host")
+    codes = code_dtype(max(len(states), len(sources)))
+    state, source = (as_typed_buffer(c, codes) for c in (state, source))
+    names = {"states": states, "sources": sources}
+    if codes != "h":
+        names["codes"] = codes
+    names = json.dumps(names).encode()
+    names += b" " * (-len(names) % 8)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as file:
+            file.write(BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION,
+                                          len(year), len(names)))
+            file.write(names)
+            offset = 0
+            for column in (mwh, year, state, source):
+                view = memoryview(column)
+                file.write(b"\0" * (-offset % view.itemsize))
+                offset += -offset % view.itemsize + view.nbytes
+                file.write(view.cast("B"))
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def as_typed_buffer(column, typecode):
+    """ Return column as a buffer of the given array type code.
+
+    Args:
+        column (buffer of int): an array("h"), array("i") or numpy array.
+        typecode (str): "h" or "i".
+    """
+    if memoryview(column).format == typecode:
+        return column
+    if np is not None and isinstance(column, np.ndarray):
+        return np.ascontiguousarray(column, dtype=typecode)
+    return array(typecode, column)
+
+
+def map_binary(filename):
+    """ Map a binary column file into memory without copying it.
+
+    Args:
+        filename (str): a file written by write_binary().
+
+    Returns:
+        tuple: memoryviews of the year, state, source and MWh columns
+        (formats "h", "h" or "i", "h" or "i", and "d") over the mapped
+        file, and the lists of state and source names.
+
+    Raises:
+        ValueError: the file is not in a supported binary format.
+    """
+    if sys.byteorder != "little":
+        raise ValueError("the binary format requires a little-endian host")
+    with open(filename, "rb") as file:
+        buffer = memoryview(mmap.mmap(file.fileno(), 0,
+                                      access=mmap.ACCESS_READ))
+    magic, version, rows, names_len = BINARY_HEADER.unpack_from(buffer)
+    if magic != BINARY_MAGIC or version != BINARY_VERSION:
+        raise ValueError(f"{filename} is not a version {BINARY_VERSION}"
+                         " energy column file")
+    start = BINARY_HEADER.size
+    names = json.loads(bytes(buffer[start:start + names_len]))
+    start += names_len
+    codes = names.get("codes", "h")
+    columns = {}
+    for name, fmt in (("mwh", "d"), ("year", "h"), ("state", codes),
+                      ("source", codes)):
+        width = struct.calcsize(fmt)
+        start += -start % width
+        columns[name] = buffer[start:start + rows * width].cast(fmt)
+        start += rows * width
+    return (columns["year"], columns["state"], columns["source"],
+            columns["mwh"], names["states"], names["sources"])
+
+
+class OffsetLines:
+    """ Decoded lines of a binary file, tracking how far they were read.
+
+    Attributes:
+        file (file): an open binary file.
+        offset (int): byte offset just past the last line yielded.
+        complete_only (bool): if True, stop before a final line that has
+            no newline yet.
+    """
+    def __init__(self, file, complete_only=False):
+        self.file = file
+        self.offset = file.tell()
+        self.complete_only = complete_only
+
+    def __iter__(self):
+        for line in self.file:
+            if self.complete_only and not line.endswith(b"\n"):
+                return
+            self.offset += len(line)
+            yield line.decode("utf-8")
+
+
+def complete_lines_end(file):
+    """ Find the end of the last complete line of a binary file.
+
+    Scans backwards from the end in blocks, so only the tail of the file
+    is read.
+
+    Args:
+        file (file): an open binary file; its position is where the
+            search stops (e.g. just after the header) and is restored.
+
+    Returns:
+        int: the offset just past the last newline, or the current
+        position if there is no newline after it.
+    """
+    start = file.tell()
+    end = os.fstat(file.fileno()).st_size
+    while end > start:
+        block_start = max(start, end - (1 << 16))
+        file.seek(block_start)
+        i = file.read(end - block_start).rfind(b"\n")
+        if i >= 0:
+            end = block_start + i + 1
+            break
+        end = block_start
+    file.seek(start)
+    return end
+
+
+class BoundedReader(io.RawIOBase):
+    """ A raw binary reader that stops at a byte offset of a file.
+
+    Attributes:
+        file (file): the underlying open binary file.
+        remaining (int): number of bytes left before the bound.
+    """
+    def __init__(self, file, end):
+        self.file = file
+        self.remaining = end - file.tell()
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), self.remaining)
+        if size <= 0:
+            return 0
+        size = self.file.readinto(memoryview(buffer)[:size])
+        self.remaining -= size
+        return size
+
+
+def read_batches(file, batch_size=BATCH_SIZE):
+    """ Parse energy CSV rows from an open file in batches.
+
+    Args:
+        file (iterable of str): an open text file (or other iterable of
+            lines) positioned after the header row.
+        batch_size (int): maximum number of rows per batch.
+
+    Yields:
+        list of (int, str, str, float): year, state, source and MWh for
+        each row in the batch.
+    """
+    reader = csv.reader(file)
+    while True:
+        batch = [(int(year), state, source, float(mwh))
+                 for year, state, source, mwh in islice(reader, batch_size)]
+        if not batch:
+            return
+        yield batch
+
+
+def encode_names(names, codes):
+    """ Dictionary-encode a sequence of names.
+
+    Args:
+        names (sequence of str): the names to encode.
+        codes (dict of str: int): existing codes; names not yet in it are
+            assigned the next free code.
+
+    Returns:
+        numpy.ndarray of int16 or int32: the code of each name; int32
+        once codes holds more names than int16 can number.
+
+    Side effects:
+        Adds unseen names to codes.
+    """
+    encoded = np.fromiter((codes.setdefault(n, len(codes)) for n in names),
+                          dtype=np.int32, count=len(names))
+    return encoded.astype(code_dtype(len(codes)))
+
+
+def code_dtype(count):
+    """ Return the smallest integer type for codes of count names.
+
+    Returns:
+        str: the array type code, "h" (int16) or "i" (int32).
+    """
+    return "h" if count <= 2 ** 15 else "i"
+
+
+class RollupCube:
+    """ Precomputed production totals over subsets of (year, state, source).
+
+    Attributes:
+        by_year (dict of int: float): national totals by year.
+        by_source (dict of (str, int): float): totals by source and year.
+        by_state (dict of (str, int): float): totals by state and year.
+        by_source_state (dict of (str, int, str): float): totals by
+            source, year and state.
+    """
+    def __init__(self):
+        self.by_year = {}
+        self.by_source = {}
+        self.by_state = {}
+        self.by_source_state = {}
+
+    @classmethod
+    def from_matrix(cls, matrix):
+        """ Build a cube from the finest-grained totals.
+
+        Args:
+            matrix (dict of (str, int, str): float): totals keyed by
+                (source, year, state), as returned by
+                production_matrix(by_state=True).
+
+        Returns:
+            RollupCube: the cube.
+        """
+        cube = cls()
+        for (source, year, state), mwh in matrix.items():
+            cube.add(year, state, source, mwh)
+        return cube
+
+    def add(self, year, state, source, mwh):
+        """ Add production to every total it contributes to.
+
+        Args:
+            year (int): the year.
+            state (str): the state.
+            source (str): the energy source.
+            mwh (float): production in MWh.
+        """
+        self.by_year[year] = self.by_year.get(year, 0.0) + mwh
+        key = (source, year)
+        self.by_source[key] = self.by_source.get(key, 0.0) + mwh
+        key = (state, year)
+        self.by_state[key] = self.by_state.get(key, 0.0) + mwh
+        key = (source, year, state)
+        self.by_source_state[key] = self.by_source_state.get(key, 0.0) + mwh
+
+    def add_rows(self, rows):
+        """ Add parsed rows to the cube.
+
+        Args:
+            rows (iterable of (int, str, str, float)): year, state, source
+                and MWh for each row.
+        """
+        for year, state, source, mwh in rows:
+            self.add(year, state, source, mwh)
+
+    def total(self, year, state=None, source=None):
+        """ Look up a total.
+
+        Args:
+            year (int): the year.
+            state (str): restrict to one state (default: all states).
+            source (str): restrict to one source (default: all sources).
+
+        Returns:
+            float: the total in MWh, or None if there is no such data.
+        """
+        if state is None and source is None:
+            return self.by_year.get(year)
+        if state is None:
+            return self.by_source.get((source, year))
+        if source is None:
+            return self.by_state.get((state, year))
+        return self.by_source_state.get((source, year, state))
+
+    def production_matrix(self, sources=None, years=None, states=None,
+                          by_state=False):
+        """ Calculate total production for many sources and years at once.
+
+        Args, Returns: see EnergyDB.production_matrix().
+        """
+        if states is None and not by_state:
+            totals = self.by_source
+        else:
+            totals = self.by_source_state
+        sources = None if sources is None else set(sources)
+        years = None if years is None else set(years)
+        states = None if states is None else set(states)
+
+        matrix = {}
+        for key, mwh in totals.items():
+            if ((sources is not None and key[0] not in sources) or
+                    (years is not None and key[1] not in years) or
+                    (states is not None and key[2] not in states)):
+                continue
+            if not by_state:
+                key = key[:2]
+            matrix[key] = matrix.get(key, 0.0) + mwh
+        return matrix
+
+
+class ColumnStore:
+    """ Energy production data held in typed NumPy column arrays.
+
+    State and source names are dictionary-encoded: each row stores a
+    small integer code, and the names are kept once in a lookup list.
+
+    Attributes:
+        year (numpy.ndarray of int16): year of each row.
+        state (numpy.ndarray of int16 or int32): state code of each row
+            (see encode_names()).
+        source (numpy.ndarray of int16 or int32): source code of each row.
+        mwh (numpy.ndarray of float64): production of each row in MWh.
+        states (list of str): state names, indexed by state code.
+        sources (list of str): source names, indexed by source code.
+    """
+    def __init__(self, year, state, source, mwh, states, sources):
+        if np is None:
+            raise ImportError("the numpy backend requires numpy")
+        self.year = year
+        self.state = state
+        self.source = source
+        self.mwh = mwh
+        self.states = states
+        self.sources = sources
+        self.state_codes = {name: code for code, name in enumerate(states)}
+        self.source_codes = {name: code for code, name in enumerate(sources)}
+
+    @classmethod
+    def from_batches(cls, batches):
+        """ Build a column store from batches of parsed rows.
+
+        Args:
+            batches (iterable of list): batches as yielded by read_batches().
+
+        Returns:
+            ColumnStore: the encoded data.
+        """
+        if np is None:
+            raise ImportError("the numpy backend requires numpy")
+        state_codes = {}
+        source_codes = {}
+        columns = ([], [], [], [])
+        for batch in batches:
+            years, states, sources, mwhs = zip(*batch)
+            columns[0].append(np.array(years, dtype=np.int16))
+            columns[1].append(encode_names(states, state_codes))
+            columns[2].append(encode_names(sources, source_codes))
+            columns[3].append(np.array(mwhs, dtype=np.float64))
+        dtypes = (np.int16, np.int16, np.int16, np.float64)
+        year, state, source, mwh = (
+            np.concatenate(parts) if parts else np.empty(0, dtype=dtype)
+            for parts, dtype in zip(columns, dtypes))
+        return cls(year, state, source, mwh, list(state_codes),
+                   list(source_codes))
+
+    @classmethod
+    def from_binary(cls, filename):
+        """ Open a binary column file as a column store.
+
+        The arrays are views over the memory-mapped file, so opening is
+        immediate and aggregation reads the mapped pages directly.
+
+        Args:
+            filename (str): a file written by write_binary().
+
+        Returns:
+            ColumnStore: the mapped data.
+        """
+        if np is None:
+            raise ImportError("the numpy backend requires numpy")
+        year, state, source, mwh, states, sources = map_binary(filename)
+        return cls(np.frombuffer(year, dtype=np.int16),
+                   np.frombuffer(state, dtype=state.format),
+                   np.frombuffer(source, dtype=source.format),
+                   np.frombuffer(mwh, dtype=np.float64), states, sources)
+
+    def __len__(self):
+        return len(self.year)
+
+    def append(self, rows):
+        """ Append parsed rows to the columns.
+
+        Args:
+            rows (list of (int, str, str, float)): year, state, source and
+                MWh for each new row.
+
+        Side effects:
+            Extends the column arrays and, for previously unseen names,
+            the states and sources lists.
+        """
+        if not rows:
+            return
+        years, states, sources, mwhs = zip(*rows)
+        self.year = np.concatenate(
+            [self.year, np.array(years, dtype=np.int16)])
+        self.state = np.concatenate(
+            [self.state, encode_names(states, self.state_codes)])
+        self.source = np.concatenate(
+            [self.source, encode_names(sources, self.source_codes)])
+        self.mwh = np.concatenate(
+            [self.mwh, np.array(mwhs, dtype=np.float64)])
+        self.states = list(self.state_codes)
+        self.sources = list(self.source_codes)
+
+    def production_by_source(self, source, year):
+        """ Calculate the total energy production by source and year.
+
+        Args:
+            source (str): The energy source name.
+            year (int): The year for which to calculate the total production.
+
+        Returns:
+            float: The total production in MWh, or None if there is no
+            data for source in year.
+        """
+        code = self.source_codes.get(source)
+        if code is None:
+            return None
+        mask = (self.source == code) & (self.year == year)
+        if not mask.any():
+            return None
+        return float(self.mwh[mask].sum())
+
+    def production_matrix(self, sources=None, years=None, states=None,
+                          by_state=False):
+        """ Calculate total production for many sources and years at once.
+
+        Rows are filtered with vectorized masks and summed per group with
+        a single numpy.bincount().
+
+        Args, Returns: see EnergyDB.production_matrix().
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if sources is not None:
+            codes = [self.source_codes[s] for s in sources
+                     if s in self.source_codes]
+            mask &= np.isin(self.source, codes)
+        if years is not None:
+            mask &= np.isin(self.year, list(years))
+        if states is not None:
+            codes = [self.state_codes[s] for s in states
+                     if s in self.state_codes]
+            mask &= np.isin(self.state, codes)
+        if not mask.any():
+            return {}
+
+        year = self.year[mask].astype(np.int64)
+        first_year = int(year.min())
+        n_years = int(year.max()) - first_year + 1
+        group = (self.source[mask].astype(np.int64) * n_years
+                 + (year - first_year))
+        n_groups = len(self.sources) * n_years
+        if by_state:
+            group = group * len(self.states) + self.state[mask]
+            n_groups *= len(self.states)
+        totals = np.bincount(group, weights=self.mwh[mask], minlength=n_groups)
+        present = np.bincount(group, minlength=n_groups).nonzero()[0]
+
+        matrix = {}
+        for g, total in zip(present.tolist(), totals[present].tolist()):
+            if by_state:
+                g, state = divmod(g, len(self.states))
+            source, year_offset = divmod(g, n_years)
+            key = (self.sources[source], first_year + year_offset)
+            if by_state:
+                key += (self.states[state],)
+            matrix[key] = total
+        return matrix
+
+
+class ResultCache:
+    """ A bounded least-recently-used cache of query results.
+
+    Attributes:
+        maxsize (int): maximum number of results kept.
+        hits (int): number of lookups answered from the cache.
+        misses (int): number of lookups that had to be computed.
+    """
+    def __init__(self, maxsize=RESULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, compute):
+        """ Return the cached result for key, computing it if needed.
+
+        Args:
+            key (hashable): identifies the query and its arguments.
+            compute (callable): called with no arguments on a miss.
+
+        Returns:
+            the cached or newly computed result.
+        """
+        try:
+            self.entries.move_to_end(key)
+        except KeyError:
+            self.misses += 1
+            result = self.entries[key] = compute()
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+            return result
+        self.hits += 1
+        return self.entries[key]
+
+    def clear(self):
+        """ Drop every cached result, e.g. because the data changed. """
+        self.entries.clear()
+
+
+class ReaderPool:
+    """ A fixed set of read-only connections to one shared in-memory
+    database, safe to use from many threads at once.
+
+    Each query borrows a connection for its duration, so up to size
+    queries run concurrently without copying the data.
+
+    Attributes:
+        uri (str): SQLite URI of the shared in-memory database.
+        size (int): number of connections in the pool.
+    """
+    def __init__(self, uri, size=4):
+        self.uri = uri
+        self.size = size
+        self.idle = Queue()
+        for _ in range(size):
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            conn.execute("PRAGMA query_only = ON")
+            # readers never take shared-cache table locks, so they are not
+            # blocked (or failed) while the loader appends rows
+            conn.execute("PRAGMA read_uncommitted = ON")
+            self.idle.put(conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def run(self, query, *args):
+        """ Run a query function on a borrowed connection.
+
+        Args:
+            query (callable): called as query(conn, *args).
+            *args: further arguments to query.
+
+        Returns:
+            the return value of query.
+        """
+        conn = self.idle.get()
+        try:
+            return query(conn, *args)
+        finally:
+            self.idle.put(conn)
+
+    def production_by_source(self, source, year):
+        """ Thread-safe EnergyDB.production_by_source(). """
+        return self.run(query_production_by_source, source, year)
+
+    def production_matrix(self, sources=None, years=None, states=None,
+                          by_state=False):
+        """ Thread-safe EnergyDB.production_matrix(). """
+        return self.run(query_production_matrix, sources, years, states,
+                        by_state)
+
+    def close(self):
+        """ Close every connection in the pool, waiting for borrowed ones
+        to be returned. """
+        for _ in range(self.size):
+            self.idle.get().close()
+
 
 class EnergyDB:
      """
     A class for managing a in-memory SQLite database of energy production data.
 
     Attributes:
-        conn (sqlite3.Connection): The SQLite database connection.
+        backend (str): the storage engine in use ("sqlite" or "numpy").
+        conn (sqlite3.Connection): The SQLite database connection, or None
+            for the numpy backend.
+        uri (str): URI of the shared in-memory database, or None.
+        results (ResultCache): cached analytics results; cleared whenever
+            data is loaded or appended.
+        columns (ColumnStore): the column arrays for the numpy backend,
+            otherwise None.
+        rollup (bool): whether aggregate totals are precomputed.
+        cube (RollupCube): the precomputed totals, or None.
+        filename (str or list of str): the CSV file (or shards) the data
+            was read from.
+        header (bytes): the header line of filename, or None for shards.
+        offset (int): byte offset in filename up to which rows have been
+            loaded, or None for shards.
+        load_report (dict): rows loaded, seconds taken, rows per second
+            and where the rows came from ("csv", "binary" or "cache") for
+            the most recent load.
 
     Methods:
-        __init__(self, filename: str):
-            Initializes the database and creates the production table.
+        __init__(self, filename: str, cache: str, backend: str, rollup: bool,
+                 shared: bool, workers: int):
+            Initializes the database from a CSV file or a valid snapshot.
 
         __del__(self):
             Cleans up the database connection when the object is destroyed.
 
-        read(self, filename: str):
-            Reads data from a CSV file and inserts it into the database.
+        read_all(self, paths: list, workers: int):
+            Reads one CSV file or several shards.
+
+        read_shards(self, filenames: list, workers: int, batch_size: int):
+            Parses CSV shards in parallel and loads them together.
+
+        read(self, filename: str, batch_size: int):
+            Bulk loads data from a CSV file into the database.
+
+        refresh(self, batch_size: int) -> int:
+            Ingests rows appended to the CSV file since it was read.
+
+        read_binary(self, filename: str, batch_size: int):
+            Loads a file in the binary column format.
+
+        export_binary(self, path: str):
+            Writes the loaded data in the binary column format.
+
+        insert_batches(self, batches) -> int:
+            Creates the production table and bulk inserts rows into it.
+
+        load_snapshot(self, cache: str):
+            Loads the database from an on-disk snapshot.
+
+        save_snapshot(self, cache: str, filename: str):
+            Writes the database to an on-disk snapshot keyed on filename.
+
+        build_rollup(self):
+            Precomputes aggregate totals into a RollupCube.
+
+        append(self, rows: list):
+            Appends parsed rows and updates the cube incrementally.
+
+        total_production(self, year: int, state: str, source: str) -> float:
+            Calculates a yearly total, optionally for one state/source.
+
+        yoy_growth(self, source: str, state: str) -> tuple:
+            Calculates year-over-year growth of a source.
+
+        rolling_average(self, source: str, window: int, state: str) -> tuple:
+            Calculates a rolling N-year average of a source.
+
+        source_share(self, state: str, year: int) -> tuple:
+            Calculates each source's share of a state's production.
+
+        top_states(self, source: str, n: int, years: list) -> tuple:
+            Finds the top N states of a source in each year.
+
+        reader_pool(self, size: int) -> ReaderPool:
+            Opens thread-safe read-only connections to a shared database.
 
         production_by_source(self, source: str, year: int) -> float:
             Calculates the total energy production by source and year.
+
+        production_matrix(self, sources, years, states, by_state) -> dict:
+            Calculates totals for many sources and years in one query.
       """
-     def __init__(self, filename):
+     def __init__(self, filename, cache=None, backend="sqlite", rollup=False,
+                  shared=False, workers=None,
+                  result_cache_size=RESULT_CACHE_SIZE):
         """ Initialize the database and create production table.
          Args:
-            filename (str): Path to a CSV file containing energy production data.
+            filename (str or list of str): Path to a CSV file containing
+                energy production data, or a glob pattern or list of paths
+                of CSV shards with the same header, which are parsed in
+                parallel (see read_shards()), or a file in the binary
+                column format (see read_binary()).
+            cache (str): optional path to an on-disk snapshot of the
+                database. If the snapshot was built from the current
+                contents of filename it is loaded instead of parsing the
+                CSV; otherwise the CSV is parsed and the snapshot rebuilt.
+            backend (str): "sqlite" for an in-memory SQLite table, or
+                "numpy" for typed column arrays (see ColumnStore).
+            rollup (bool): if True, precompute aggregate totals into a
+                RollupCube after loading and answer aggregate queries
+                from it.
+            shared (bool): if True, keep the SQLite data in a named,
+                shared-cache in-memory database so that reader_pool() can
+                open further connections to it.
+            workers (int): number of processes used to parse shards
+                (default: one per CPU).
+            result_cache_size (int): number of analytics results to keep
+                in the LRU result cache.
+
+        Raises:
+            ValueError: backend is not one of BACKENDS, a cache or shared
+                database was requested for the numpy backend, or a cache
+                was requested for more than one file.
+            FileNotFoundError: a glob pattern matched no files.
         """
+        if backend not in BACKENDS:
+            raise ValueError(f"backend should be one of {BACKENDS}")
+        if backend == "numpy" and cache is not None:
+            raise ValueError("snapshots require the sqlite backend")
+        if backend == "numpy" and shared:
+            raise ValueError("shared databases require the sqlite backend")
+        paths = expand_paths(filename)
+        if len(paths) > 1 and cache is not None:
+            raise ValueError("snapshots require a single CSV file")
 
-        self.conn = sqlite3.connect(":memory:")
-        self.read(filename)
+        self.backend = backend
+        self.results = ResultCache(result_cache_size)
+        self.rollup = rollup
+        self.cube = None
+        self.columns = None
+        self.conn = None
+        self.uri = None
+        if backend == "numpy":
+            self.read_all(paths, workers)
+        else:
+            if shared:
+                self.uri = (f"file:energydb-{uuid.uuid4().hex}"
+                            "?mode=memory&cache=shared")
+                self.conn = sqlite3.connect(self.uri, uri=True,
+                                            check_same_thread=False)
+            else:
+                self.conn = sqlite3.connect(":memory:")
+            offset = (snapshot_offset(cache, paths[0])
+                      if cache is not None else None)
+            if offset is not None:
+                self.load_snapshot(cache)
+                # the snapshot holds the file up to the recorded offset
+                with open(paths[0], "rb") as file:
+                    self.header = file.readline()
+                self.filename = paths[0]
+                self.offset = offset
+            else:
+                self.read_all(paths, workers)
+                if cache is not None:
+                    self.save_snapshot(cache, paths[0])
+        if rollup:
+            self.build_rollup()
      
      def __del__(self):
         """ Clean up the database connection. """
@@ -38,25 +1058,505 @@ class EnergyDB:
         except:
             pass
 
-     def read(self, filename):
+     def read_all(self, paths, workers=None):
+        """ Read one CSV file with read(), several with read_shards(), or
+        one binary column file with read_binary().
+
+        Args:
+            paths (list of str): the CSV files.
+            workers (int): number of parsing processes for read_shards().
+        """
+        if len(paths) > 1:
+            self.read_shards(paths, workers)
+        elif is_binary(paths[0]):
+            self.read_binary(paths[0])
+        else:
+            self.read(paths[0])
+
+     def read_binary(self, filename, batch_size=BATCH_SIZE):
+        """ Load a file in the binary column format.
+
+        For the numpy backend the file is memory-mapped and used in place
+        (see ColumnStore.from_binary()); for SQLite the mapped columns
+        are decoded and bulk inserted without any text parsing.
+
+        Args:
+            filename (str): a file written by write_binary().
+            batch_size (int): number of rows to insert per executemany()
+                call.
+
+        Side effects:
+            Creates and populates the production table (or the columns
+            attribute) and sets the load_report attribute.
+        """
+        start = time.perf_counter()
+        if self.backend == "numpy":
+            self.columns = ColumnStore.from_binary(filename)
+            rows = len(self.columns)
+        else:
+            year, state, source, mwh, states, sources = map_binary(filename)
+
+            def batches():
+                for i in range(0, len(year), batch_size):
+                    j = i + batch_size
+                    yield list(zip(year[i:j],
+                                   [states[c] for c in state[i:j]],
+                                   [sources[c] for c in source[i:j]],
+                                   mwh[i:j]))
+
+            rows = self.insert_batches(batches())
+        self.filename = filename
+        self.header = None
+        self.offset = None
+        self.load_report = make_load_report(rows, start, "binary")
+        self.results.clear()
+
+     def read_shards(self, filenames, workers=None, batch_size=BATCH_SIZE):
+        """ Parse several CSV shards in parallel and load them together.
+
+        Each shard is parsed in a process pool (see parse_shard()); the
+        parsed columns are merged in input order by this process, which
+        is the only writer to the database.
+
+        Args:
+            filenames (list of str): the shards. Every shard must have the
+                same header as the first.
+            workers (int): number of parsing processes (default: one per
+                CPU).
+            batch_size (int): number of rows to insert per executemany()
+                call.
+
+        Raises:
+            ValueError: a shard's header differs from the first shard's.
+
+        Side effects:
+            Creates and populates the production table (or the columns
+            attribute) and sets the load_report attribute, which lists
+            the rows and parse time of each shard under "shards".
+        """
+        start = time.perf_counter()
+        shards = []
+
+        def batches(parsed):
+            for shard in parsed:
+                if shards and shard["header"] != shards[0]["header"]:
+                    raise ValueError(
+                        f"header of {shard['file']} ({shard['header']!r}) "
+                        f"does not match {shards[0]['file']} "
+                        f"({shards[0]['header']!r})")
+                rows = zip(*shard.pop("columns"))
+                shards.append(shard)
+                while True:
+                    batch = list(islice(rows, batch_size))
+                    if not batch:
+                        break
+                    yield batch
+
+        with ProcessPoolExecutor(workers) as executor:
+            parsed = executor.map(parse_shard, filenames)
+            if self.backend == "numpy":
+                self.columns = ColumnStore.from_batches(batches(parsed))
+                rows = len(self.columns)
+            else:
+                rows = self.insert_batches(batches(parsed))
+        self.filename = list(filenames)
+        self.header = None
+        self.offset = None
+        self.load_report = make_load_report(rows, start, "csv")
+        self.load_report["shards"] = shards
+        self.results.clear()
+
+     def read(self, filename, batch_size=BATCH_SIZE):
         """ Read data from a CSV file and insert it into the database.
-         Args:
-            filename (str): Path to a CSV file containing energy production data. """
-        
+
+        Rows are parsed with a streaming CSV reader and inserted in
+        batches of batch_size with executemany(), all inside a single
+        transaction with load-tuned pragmas. For the numpy backend the
+        batches are encoded into a ColumnStore instead.
+
+        Args:
+            filename (str): Path to a CSV file containing energy production data.
+            batch_size (int): number of rows to insert per executemany() call.
+
+        Side effects:
+            Creates and populates the production table (or the columns
+            attribute), records the header and end offset of the file for
+            refresh(), and sets the load_report attribute. As in
+            refresh(), a final line without a newline is assumed to be
+            still being written and is left for the next refresh.
+        """
+        start = time.perf_counter()
+        with open(filename, "rb") as raw:
+            self.header = raw.readline()
+            offset = complete_lines_end(raw)
+            # reading stops at the last newline, without checking each line
+            file = io.TextIOWrapper(
+                io.BufferedReader(BoundedReader(raw, offset), 1 << 20),
+                encoding="utf-8", newline="")
+            if self.backend == "numpy":
+                self.columns = ColumnStore.from_batches(
+                    read_batches(file, batch_size))
+                rows = len(self.columns)
+            else:
+                rows = self.insert_batches(read_batches(file, batch_size))
+            file.detach()
+        self.filename = filename
+        self.offset = offset
+        self.load_report = make_load_report(rows, start, "csv")
+        self.results.clear()
+
+     def refresh(self, batch_size=BATCH_SIZE):
+        """ Ingest rows appended to the CSV file since it was last read.
+
+        Reading resumes at the byte offset where the previous read or
+        refresh stopped. A final line without a newline is assumed to be
+        still being written and is left for the next refresh.
+
+        Args:
+            batch_size (int): number of rows to append at a time.
+
+        Returns:
+            int: the number of new rows.
+
+        Raises:
+            ValueError: the data was not read from a single CSV file, or the
+                file's header has changed or the file is shorter than
+                what was already read, so the new contents are not an
+                append; construct a new EnergyDB instead.
+
+        Side effects:
+            Appends the new rows (see append()) and advances the offset
+            past each appended batch, so if a row cannot be parsed, the
+            batches before it stay ingested and the next refresh resumes
+            at the batch holding the bad row.
+        """
+        if self.offset is None:
+            raise ValueError("refresh() requires a single CSV file")
+        with open(self.filename, "rb") as file:
+            if file.readline() != self.header:
+                raise ValueError(f"header of {self.filename} has changed")
+            if os.fstat(file.fileno()).st_size < self.offset:
+                raise ValueError(f"{self.filename} has been truncated")
+            file.seek(self.offset)
+            lines = OffsetLines(file, complete_only=True)
+            rows = 0
+            for batch in read_batches(lines, batch_size):
+                self.append(batch)
+                rows += len(batch)
+                # move past each batch as it is appended, so that a bad
+                # row later on does not make a retry append it again
+                self.offset = lines.offset
+        return rows
+
+     def insert_batches(self, batches):
+        """ Create the production table and bulk insert rows into it.
+
+        Args:
+            batches (iterable of list): batches as yielded by read_batches().
+
+        Returns:
+            int: the number of rows inserted.
+
+        Side effects:
+            Creates, populates and indexes the production table.
+        """
         cursor = self.conn.cursor()
+        for pragma in LOAD_PRAGMAS:
+            cursor.execute(pragma)
         cursor.execute("""
             CREATE TABLE production
             (year integer, state text, source text, mwh real)
         """)
-        
-        with open(filename, "r") as file:
-            file.readline()  # Skip the header
-            for line in file:
-                year, state, source, mwh = line.strip().split(',')
-                cursor.execute("INSERT INTO production VALUES (?,?,?,?)",
-                               (int(year), state, source, float(mwh)))
 
+        rows = 0
+        for batch in batches:
+            cursor.executemany("INSERT INTO production VALUES (?,?,?,?)",
+                               batch)
+            rows += len(batch)
+
+        # building the index once after the load is cheaper than
+        # maintaining it on every insert
+        cursor.execute(PRODUCTION_INDEX)
         self.conn.commit()
+        return rows
+
+     def load_snapshot(self, cache):
+        """ Copy a snapshot written by save_snapshot() into memory.
+
+        Args:
+            cache (str): path to the snapshot file.
+
+        Side effects:
+            Replaces the contents of the in-memory database and sets the
+            load_report attribute.
+        """
+        start = time.perf_counter()
+        snap = sqlite3.connect(f"file:{cache}?mode=ro", uri=True)
+        try:
+            snap.backup(self.conn)
+        finally:
+            snap.close()
+        self.conn.execute(PRODUCTION_INDEX)
+        rows = self.conn.execute(
+            "SELECT COUNT(*) FROM production").fetchone()[0]
+        self.load_report = make_load_report(rows, start, "cache")
+        self.results.clear()
+
+     def save_snapshot(self, cache, filename):
+        """ Write the database to disk, keyed on the CSV it was read from.
+
+        The key covers exactly the bytes that were loaded (up to the
+        offset attribute), so rows appended to the file during or after
+        the load are not mistaken for part of the snapshot.
+
+        The snapshot is written to a temporary file and moved into place,
+        so a concurrent reader never sees a partial snapshot.
+
+        Args:
+            cache (str): path to the snapshot file.
+            filename (str): path to the CSV file the data was read from.
+
+        Side effects:
+            Creates or replaces the file at cache.
+        """
+        key = source_key(filename, self.offset)
+        tmp = f"{cache}.{os.getpid()}.tmp"
+        snap = sqlite3.connect(tmp)
+        try:
+            self.conn.backup(snap)
+            snap.execute("DROP TABLE IF EXISTS source_meta")
+            snap.execute("CREATE TABLE source_meta"
+                         " (path text, size integer, mtime_ns integer,"
+                         " sha256 text)")
+            snap.execute("INSERT INTO source_meta VALUES (?,?,?,?)",
+                         (key["path"], key["size"], key["mtime_ns"],
+                          key["sha256"]))
+            snap.commit()
+        finally:
+            snap.close()
+        os.replace(tmp, cache)
+
+     def export_binary(self, path):
+        """ Write the loaded data in the binary column format.
+
+        Args:
+            path (str): the file to write (see write_binary()).
+
+        Side effects:
+            Creates or replaces the file at path.
+        """
+        if self.columns is not None:
+            c = self.columns
+            write_binary(path, np.ascontiguousarray(c.year),
+                         np.ascontiguousarray(c.state),
+                         np.ascontiguousarray(c.source),
+                         np.ascontiguousarray(c.mwh), c.states, c.sources)
+            return
+        year = array("h")
+        state = array("i")
+        source = array("i")
+        mwh = array("d")
+        state_codes = {}
+        source_codes = {}
+        cursor = self.conn.execute("SELECT year, state, source, mwh"
+                                   " FROM production ORDER BY rowid")
+        for y, st, so, m in cursor:
+            year.append(y)
+            state.append(state_codes.setdefault(st, len(state_codes)))
+            source.append(source_codes.setdefault(so, len(source_codes)))
+            mwh.append(m)
+        write_binary(path, year, state, source, mwh, list(state_codes),
+                     list(source_codes))
+
+     def build_rollup(self):
+        """ Precompute the aggregate cube from the loaded data.
+
+        Side effects:
+            Sets the cube attribute.
+        """
+        self.cube = None
+        matrix = self.production_matrix(by_state=True)
+        self.cube = RollupCube.from_matrix(matrix)
+
+     def append(self, rows):
+        """ Append parsed rows to the loaded data.
+
+        Args:
+            rows (list of (int, str, str, float)): year, state, source and
+                MWh for each new row.
+
+        Side effects:
+            Inserts the rows into the production table (or column arrays),
+            updates the cube, if any, incrementally and clears the result
+            cache.
+        """
+        if self.columns is not None:
+            self.columns.append(rows)
+        else:
+            self.conn.executemany("INSERT INTO production VALUES (?,?,?,?)",
+                                  rows)
+            self.conn.commit()
+        if self.cube is not None:
+            self.cube.add_rows(rows)
+        self.results.clear()
+
+     def total_production(self, year, state=None, source=None):
+        """ Calculate total production in a year, optionally for one state
+        and/or source.
+
+        Args:
+            year (int): the year.
+            state (str): restrict to one state (default: all states).
+            source (str): restrict to one source (default: all sources).
+
+        Returns:
+            float: the total in MWh, or None if there is no such data.
+        """
+        if self.cube is not None:
+            return self.cube.total(year, state, source)
+        matrix = self.production_matrix(
+            sources=None if source is None else [source], years=[year],
+            states=None if state is None else [state])
+        return sum(matrix.values()) if matrix else None
+
+     def analytics_query(self, name, query, params):
+        """ Run an analytics query through the result cache.
+
+        Args:
+            name (str): name of the analytics method, part of the cache key.
+            query (str): SQL to run against the production table.
+            params (tuple): query parameters, the rest of the cache key.
+
+        Returns:
+            tuple of tuple: the result rows.
+
+        Raises:
+            ValueError: the data is not held in SQLite.
+        """
+        if self.conn is None:
+            raise ValueError("analytics require the sqlite backend")
+        return self.results.get(
+            (name,) + tuple(params),
+            lambda: tuple(self.conn.execute(query, params).fetchall()))
+
+     def yoy_growth(self, source, state=None):
+        """ Calculate year-over-year growth in production of a source.
+
+        Args:
+            source (str): The energy source name.
+            state (str): restrict to one state (default: national totals).
+
+        Returns:
+            tuple of (int, float, float): year, total MWh and growth as a
+            fraction of the previous year's total, oldest year first.
+            Growth is None for the first year and after a zero total.
+        """
+        return self.analytics_query("yoy_growth", """
+            SELECT year, total,
+                   (total - LAG(total) OVER w) / NULLIF(LAG(total) OVER w, 0)
+            FROM (SELECT year, SUM(mwh) AS total FROM production
+                  WHERE source = ?1 AND (?2 IS NULL OR state = ?2)
+                  GROUP BY year)
+            WINDOW w AS (ORDER BY year)
+            ORDER BY year
+        """, (source, state))
+
+     def rolling_average(self, source, window=3, state=None):
+        """ Calculate a rolling average of yearly production of a source.
+
+        Args:
+            source (str): The energy source name.
+            window (int): number of years averaged, ending at each year.
+            state (str): restrict to one state (default: national totals).
+
+        Returns:
+            tuple of (int, float): year and the average yearly total in
+            MWh over the window ending that year, oldest year first.
+            Early years average over the years available.
+
+        Raises:
+            ValueError: window is less than 1.
+        """
+        if window < 1:
+            raise ValueError("window should be at least 1")
+        return self.analytics_query("rolling_average", """
+            SELECT year, AVG(total) OVER (ORDER BY year
+                                          ROWS ?3 - 1 PRECEDING)
+            FROM (SELECT year, SUM(mwh) AS total FROM production
+                  WHERE source = ?1 AND (?2 IS NULL OR state = ?2)
+                  GROUP BY year)
+            ORDER BY year
+        """, (source, state, window))
+
+     def source_share(self, state, year):
+        """ Calculate each source's share of a state's production.
+
+        Args:
+            state (str): the state.
+            year (int): the year.
+
+        Returns:
+            tuple of (str, float, float): source, total MWh and share of
+            the state's total production, largest share first.
+        """
+        return self.analytics_query("source_share", """
+            SELECT source, SUM(mwh),
+                   SUM(mwh) / NULLIF(SUM(SUM(mwh)) OVER (), 0)
+            FROM production
+            WHERE state = ? AND year = ?
+            GROUP BY source
+            ORDER BY 2 DESC, source
+        """, (state, year))
+
+     def top_states(self, source, n=5, years=None):
+        """ Find the top producing states of a source in each year.
+
+        Args:
+            source (str): The energy source name.
+            n (int): number of states per year.
+            years (list of int): years to include (default: all).
+
+        Returns:
+            tuple of (int, int, str, float): year, rank (1 is highest),
+            state and total MWh, ordered by year and then rank.
+        """
+        params = (source, n)
+        year_filter = ""
+        if years is not None:
+            years = tuple(sorted(years))
+            numbers = range(len(params) + 1, len(params) + len(years) + 1)
+            year_filter = f"AND year IN ({','.join(f'?{i}' for i in numbers)})"
+            params += years
+        return self.analytics_query("top_states", f"""
+            SELECT year, rank, state, total FROM (
+                SELECT year, state, SUM(mwh) AS total,
+                       ROW_NUMBER() OVER (PARTITION BY year
+                                          ORDER BY SUM(mwh) DESC,
+                                                   state) AS rank
+                FROM production
+                WHERE source = ?1 {year_filter}
+                GROUP BY year, state)
+            WHERE rank <= ?2
+            ORDER BY year, rank
+        """, params)
+
+     def reader_pool(self, size=4):
+        """ Open a pool of read-only connections to the shared database.
+
+        Args:
+            size (int): number of connections, i.e. the number of queries
+                that can run at the same time.
+
+        Returns:
+            ReaderPool: the pool; close it (or use it in a with statement)
+            when done.
+
+        Raises:
+            ValueError: the database was not constructed with shared=True.
+        """
+        if self.uri is None:
+            raise ValueError("reader_pool() requires EnergyDB(shared=True)")
+        return ReaderPool(self.uri, size)
 
      def production_by_source(self, source, year):
         """ Calculate the total energy production by source and year.
@@ -67,38 +1567,126 @@ class EnergyDB:
 
         Returns:
             float: The total energy production in megawatt hours (MWh). """
-        
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT SUM(mwh) FROM production WHERE source=? AND year=?",
-                       (source, year))
-        total_mwh = cursor.fetchone()[0]
-        return total_mwh
+        if self.cube is not None:
+            return self.cube.by_source.get((source, year))
+        if self.columns is not None:
+            return self.columns.production_by_source(source, year)
+
+        return query_production_by_source(self.conn, source, year)
+
+     def production_matrix(self, sources=None, years=None, states=None,
+                           by_state=False):
+        """ Calculate total production for many sources and years at once.
+
+        All totals are computed by a single GROUP BY query over the
+        (source, year, state) index.
+
+        Args:
+            sources (list of str): energy sources to include (default: all).
+            years (list of int): years to include (default: all).
+            states (list of str): states to include (default: all).
+            by_state (bool): if True, report a separate total per state.
 
-def main(filename):
+        Returns:
+            dict: total production in MWh keyed by (source, year), or by
+            (source, year, state) if by_state is True. Combinations with
+            no production data are omitted.
+        """
+        if self.cube is not None:
+            return self.cube.production_matrix(sources, years, states,
+                                               by_state)
+        if self.columns is not None:
+            return self.columns.production_matrix(sources, years, states,
+                                                  by_state)
+
+        return query_production_matrix(self.conn, sources, years, states,
+                                       by_state)
+
+def main(filename, report=False, cache=None, backend="sqlite",
+         rollup=False, workers=None):
     """ Build a database of energy sources and calculate the total production
     of solar and wind energy.
 
     Args:
-    filename (str): path to a CSV file containing four columns:
-    Year, State, Energy Source, Megawatthours.
+    filename (str or list of str): path to a CSV file containing four
+    columns: Year, State, Energy Source, Megawatthours; or a glob pattern
+    or list of such files.
+    report (bool): if True, write load throughput to stderr.
+    cache (str): optional path to an on-disk snapshot of the database.
+    backend (str): storage engine, "sqlite" or "numpy".
+    rollup (bool): if True, precompute aggregate totals after loading.
+    workers (int): number of processes used to parse several files.
 
     Side effects:
-    Writes to stdout.
+    Writes to stdout (and stderr if report is True).
     """
-    e = EnergyDB(filename)
+    e = EnergyDB(filename, cache=cache, backend=backend, rollup=rollup,
+                 workers=workers)
+    if report:
+        for shard in e.load_report.get("shards", []):
+            print(f"  {shard['file']}: {shard['rows']} rows parsed in "
+                  f"{shard['seconds']:.3f}s", file=sys.stderr)
+        print(f"Loaded {e.load_report['rows']} rows in "
+              f"{e.load_report['seconds']:.3f}s "
+              f"({e.load_report['rows_per_sec']:,.0f} rows/sec) "
+              f"from {e.load_report['source']}",
+              file=sys.stderr)
     sources = [("solar", "Solar Thermal and Photovoltaic"),
                ("wind", "Wind")]
+    totals = e.production_matrix(sources=[s for _, s in sources], years=[2017])
     for source_lbl, source_str in sources:
         print(f"Total {source_lbl} production in 2017: ",
-              e.production_by_source(source_str, 2017))
+              totals.get((source_str, 2017)))
+
+def convert(filename, output, workers=None):
+    """ Convert energy CSV file(s) to the binary column format.
+
+    Args:
+        filename (str or list of str): CSV file(s) or glob pattern(s), as
+            accepted by EnergyDB.
+        output (str): path of the binary file to write.
+        workers (int): number of processes used to parse several files.
+
+    Side effects:
+        Writes the binary file and a summary to stdout.
+    """
+    backend = "sqlite" if np is None else "numpy"
+    e = EnergyDB(filename, backend=backend, workers=workers)
+    e.export_binary(output)
+    print(f"Wrote {e.load_report['rows']} rows to {output} "
+          f"({os.path.getsize(output):,} bytes)")
 
 def parse_args(arglist):
-    """ Parse command-line arguments. """
+    """ Parse command-line arguments.
 
+    "energy.py CSV... --convert OUTPUT" converts CSV files to the binary
+    column format instead of querying them.
+    """
     parser = ArgumentParser()
-    parser.add_argument("file", help="path to energy CSV file")
+    parser.add_argument("file", nargs="+",
+                        help="path(s) or glob pattern(s) of energy CSV files,"
+                             " or a binary file written with --convert")
+    parser.add_argument("--convert", metavar="OUTPUT",
+                        help="convert the CSV file(s) to the binary column"
+                             " format at OUTPUT instead of querying them")
+    parser.add_argument("--report", action="store_true",
+                        help="print load throughput (rows/sec) to stderr")
+    parser.add_argument("--cache", metavar="PATH",
+                        help="keep an on-disk snapshot of the database at PATH"
+                             " and reuse it while the CSV file is unchanged")
+    parser.add_argument("--backend", choices=BACKENDS, default="sqlite",
+                        help="storage engine for the loaded data")
+    parser.add_argument("--rollup", action="store_true",
+                        help="precompute aggregate totals after loading")
+    parser.add_argument("--workers", type=int,
+                        help="processes used to parse several CSV files"
+                             " (default: one per CPU)")
     return parser.parse_args(arglist)
 
 if __name__ == "__main__":
     args = parse_args(sys.argv[1:])
-    main(args.file)
+    if args.convert is not None:
+        convert(args.file, args.convert, workers=args.workers)
+    else:
+        main(args.file, report=args.report, cache=args.cache,
+             backend=args.backend, rollup=args.rollup, workers=args.workers)
@@ -0,0 +1,166 @@
+"""A grid index for nearest-neighbour and radius queries on the sphere."""
+from math import asin, ceil, cos, degrees, floor, pi, radians, sin
+
+from haversine import as_coordinates, earth_radius, haversine_from, np
+
+# default height and width of a grid cell in degrees
+CELL_SIZE = 1.0
+
+class GeoIndex:
+    """Points bucketed into a latitude/longitude grid.
+
+    Point indices are sorted by grid cell, so each cell is one contiguous
+    slice of the sorted order. A query first collects the cells that
+    overlap the bounding box of its search circle, then drops candidates
+    outside the box, and only the survivors get an exact haversine check.
+
+    Attributes:
+        lats, lons (numpy.ndarray): the points in decimal degrees, in the
+            order they were given.
+        cell_size (float): height and width of a cell in degrees.
+        rows, cols (int): number of cells in latitude and longitude.
+        order (numpy.ndarray of int): point indices sorted by cell.
+        cells (dict of int: (int, int)): for each non-empty cell, the
+            start and stop of its slice of order.
+    """
+    def __init__(self, lats, lons, cell_size=CELL_SIZE):
+        self.lats = as_coordinates(lats, "lats").ravel()
+        self.lons = as_coordinates(lons, "lons").ravel()
+        if len(self.lats) != len(self.lons):
+            raise ValueError("lats and lons should have the same length")
+        if np.any(np.abs(self.lats) > 90) or np.any(np.abs(self.lons) > 180):
+            raise ValueError("coordinates are out of range")
+        if not 0 < cell_size <= 90:
+            raise ValueError("cell_size should be between 0 and 90 degrees")
+        self.cell_size = cell_size
+        self.rows = ceil(180 / cell_size)
+        self.cols = ceil(360 / cell_size)
+        keys = self.row(self.lats) * self.cols + self.col(self.lons)
+        self.order = np.argsort(keys, kind="stable")
+        cells, starts, counts = np.unique(keys[self.order], return_index=True,
+                                          return_counts=True)
+        self.cells = {int(cell): (int(start), int(start + count))
+                      for cell, start, count in zip(cells, starts, counts)}
+
+    @classmethod
+    def from_points(cls, points, cell_size=CELL_SIZE):
+        """Build an index from a sequence of (lat, lon) points.
+
+        Args:
+            points (sequence of (float, float)): points in decimal degrees.
+            cell_size (float): height and width of a cell in degrees.
+
+        Returns:
+            GeoIndex: the index; query results refer to positions in points.
+        """
+        coordinates = as_coordinates(points, "points").reshape(-1, 2)
+        return cls(coordinates[:, 0], coordinates[:, 1], cell_size)
+
+    def __len__(self):
+        return len(self.lats)
+
+    def row(self, lat):
+        """Return the grid row of a latitude, or an array of them."""
+        return np.minimum(np.floor_divide(lat + 90, self.cell_size),
+                          self.rows - 1).astype(np.int64)
+
+    def col(self, lon):
+        """Return the grid column of a longitude, or an array of them."""
+        return (np.floor_divide(lon + 180, self.cell_size).astype(np.int64)
+                % self.cols)
+
+    def bounding_box(self, lat, lon, radius, units):
+        """Return the box enclosing every point within radius of (lat, lon).
+
+        Returns:
+            tuple of float: south and north latitude, and the half-width
+            in longitude, all in degrees; a half-width of 180 or more
+            means every longitude.
+        """
+        angle = radius / earth_radius(units)
+        south, north = lat - degrees(angle), lat + degrees(angle)
+        if south <= -90 or north >= 90 or angle >= pi / 2:
+            # the circle covers a pole, so every longitude
+            return max(south, -90), min(north, 90), 180.0
+        return south, north, degrees(asin(sin(angle) / cos(radians(lat))))
+
+    def candidates(self, lat, lon, radius, units):
+        """Return the indices of the points inside the bounding box.
+
+        Args:
+            lat, lon (float): centre of the search circle in decimal degrees.
+            radius (float): radius of the circle in units.
+            units (str): "km" or "mi".
+
+        Returns:
+            numpy.ndarray of int: point indices, in no particular order.
+        """
+        south, north, half_width = self.bounding_box(lat, lon, radius, units)
+        rows = range(int(self.row(south)), int(self.row(north)) + 1)
+        if half_width >= 180:
+            cols = range(self.cols)
+        else:
+            first = floor((lon - half_width + 180) / self.cell_size)
+            last = floor((lon + half_width + 180) / self.cell_size)
+            cols = sorted({c % self.cols for c in range(first, last + 1)})
+        slices = [self.cells[key] for key in
+                  (r * self.cols + c for r in rows for c in cols)
+                  if key in self.cells]
+        if not slices:
+            return np.empty(0, dtype=np.intp)
+        found = np.concatenate([self.order[start:stop]
+                                for start, stop in slices])
+        lats = self.lats[found]
+        keep = (lats >= south) & (lats <= north)
+        if half_width < 180:
+            # longitude difference wrapped into [0, 180]
+            delta = np.abs((self.lons[found] - lon + 180) % 360 - 180)
+            keep &= delta <= half_width
+        return found[keep]
+
+    def within(self, point, radius, units="km"):
+        """Find every point within a distance of point.
+
+        Args:
+            point (tuple of float, float): the centre (lat, lon) in decimal degrees.
+            radius (float): the maximum distance in units.
+            units (str): units of radius and the returned distances.
+
+        Returns:
+            tuple of numpy.ndarray: indices of the points found and their
+            distances, nearest first.
+        """
+        lat, lon = point
+        found = self.candidates(lat, lon, radius, units)
+        distances = haversine_from((lat, lon), self.lats[found],
+                                   self.lons[found], units)
+        keep = distances <= radius
+        found, distances = found[keep], distances[keep]
+        order = np.lexsort((found, distances))
+        return found[order], distances[order]
+
+    def nearest(self, point, k=1, units="km"):
+        """Find the k points nearest to point.
+
+        The search radius starts at about one cell and doubles until at
+        least k points lie inside it, which guarantees that the k nearest
+        points have all been seen.
+
+        Args:
+            point (tuple of float, float): the query (lat, lon) in decimal degrees.
+            k (int): number of points to return.
+            units (str): units of the returned distances.
+
+        Returns:
+            tuple of numpy.ndarray: indices of up to k points and their
+            distances, nearest first.
+        """
+        if k < 1:
+            raise ValueError("k should be at least 1")
+        half_circumference = pi * earth_radius(units)
+        radius = radians(self.cell_size) * earth_radius(units)
+        while True:
+            found, distances = self.within(point, radius, units)
+            if len(found) >= k or radius >= half_circumference:
+                return found[:k], distances[:k]
+            radius *= 2
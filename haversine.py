@@ -1,20 +1,143 @@
+from argparse import ArgumentParser
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import chain, islice
 from math import radians, cos, sin, asin, sqrt
+import json
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError:  # only needed for the array functions
+    np = None
+
+# default number of rows and columns in one tile of a distance matrix; a
+# float64 tile of this size is 8 MiB
+TILE_SIZE = 1024
+
+# default number of coordinate pairs per batch of the command-line tool
+BATCH_SIZE = 50_000
+
+# default size in bytes of the command-line tool's read and write buffers
+BUFFER_SIZE = 1024 * 1024
+
+# input fields of the command-line tool, in order
+PAIR_FIELDS = ("lat1", "lon1", "lat2", "lon2")
+
+# mean Earth radius in each supported unit
+EARTH_RADIUS = {"km": 6372.8, "mi": 3959.87433}
+
+def earth_radius(units):
+    """Return the Earth's radius in units ("km" or "mi").
+
+    Raises:
+        ValueError: units is not "km" or "mi".
+    """
+    if units not in EARTH_RADIUS:
+        raise ValueError("units should be 'km' or 'mi'")
+    return EARTH_RADIUS[units]
+
+class Point:
+    """A validated point on Earth with its trigonometry precomputed.
+
+    Passing Points to haversine() skips argument checking and the
+    conversions to radians, which matters when the same points are used
+    over and over. A Point also unpacks and indexes like a (lat, lon)
+    tuple, so it can be used anywhere a tuple point is accepted,
+    including in sequences of points converted to NumPy arrays (e.g. by
+    geo_index.GeoIndex.from_points()).
+
+    Attributes:
+        lat, lon (float): the coordinates in decimal degrees.
+        lat_rad, lon_rad (float): the coordinates in radians.
+        cos_lat (float): the cosine of the latitude.
+    """
+    __slots__ = ("lat", "lon", "lat_rad", "lon_rad", "cos_lat")
+
+    def __init__(self, lat, lon):
+        for value in (lat, lon):
+            if not isinstance(value, (float, int)) or isinstance(value, bool):
+                raise ValueError("coordinates must be floats")
+        if not -90 <= lat <= 90:
+            raise ValueError("latitude should be between -90 and 90")
+        if not -180 <= lon <= 180:
+            raise ValueError("longitude should be between -180 and 180")
+        setattr = object.__setattr__
+        setattr(self, "lat", float(lat))
+        setattr(self, "lon", float(lon))
+        setattr(self, "lat_rad", radians(lat))
+        setattr(self, "lon_rad", radians(lon))
+        setattr(self, "cos_lat", cos(self.lat_rad))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Point objects are read-only")
+
+    def __len__(self):
+        return 2
+
+    def __iter__(self):
+        return iter((self.lat, self.lon))
+
+    def __getitem__(self, index):
+        return (self.lat, self.lon)[index]
+
+    def __eq__(self, other):
+        if not isinstance(other, Point):
+            return NotImplemented
+        return self.lat == other.lat and self.lon == other.lon
+
+    def __hash__(self):
+        return hash((self.lat, self.lon))
+
+    def __repr__(self):
+        return f"Point({self.lat!r}, {self.lon!r})"
+
+def point_distance(point, other, name):
+    """Return the central angle between a Point and a (lat, lon) tuple.
+
+    Only the tuple is validated and converted; the Point's radians and
+    cosine are reused.
+
+    Args:
+        point (Point): a point.
+        other (tuple of float, float): the other point in decimal degrees.
+        name (str): argument name of other, for error messages.
+    """
+    if len(other) != 2:
+        raise ValueError(f"{name} should be a tuple of two floats")
+    lat, lon = other
+    if not isinstance(lat, (float, int)) or not isinstance(lon, (float, int)):
+        raise ValueError("coordinates must be floats")
+    lat = radians(lat)
+    a = (sin((lat - point.lat_rad)/2)**2
+         + point.cos_lat*cos(lat)*sin((radians(lon) - point.lon_rad)/2)**2)
+    return 2*asin(sqrt(a))
 
 def haversine(point1, point2, units="km"):
     """Calculate an approximate distance between two points on Earth.
 
     Args:
-        point1 (tuple of float, float): first point (lat, lon) in decimal degrees.
-        point2 (tuple of float, float): second point (lat, lon) in decimal degrees.
+        point1 (tuple of float, float or Point): first point (lat, lon) in decimal degrees.
+        point2 (tuple of float, float or Point): second point (lat, lon) in decimal degrees.
         units (str): units of return value. Should be "km" for kilometers or "mi" for miles. (Default: "km")
 
     Returns:
         float: the distance between the two points in the requested units.
     """
-    if units not in ["km", "mi"]:
-        raise ValueError("units should be 'km' or 'mi'")
+    R = earth_radius(units)
+    
+    if type(point1) is Point:
+        if type(point2) is Point:
+            # already validated, with radians and cosines precomputed
+            a = (sin((point2.lat_rad - point1.lat_rad)/2)**2
+                 + point1.cos_lat*point2.cos_lat
+                 * sin((point2.lon_rad - point1.lon_rad)/2)**2)
+            return R * 2*asin(sqrt(a))
+        return R * point_distance(point1, point2, "point2")
     
-    R = 6372.8 if units == "km" else 3959.87433
+    if type(point2) is Point:
+        return R * point_distance(point2, point1, "point1")
     
     if len(point1) != 2:
         raise ValueError("point1 should be a tuple of two floats")
@@ -39,3 +162,472 @@ def haversine(point1, point2, units="km"):
     
     return R * c
 
+def as_coordinates(values, name):
+    """Convert a sequence or buffer of coordinates to a float64 array.
+
+    Args:
+        values (array-like of float): coordinates in decimal degrees.
+        name (str): argument name for error messages.
+
+    Returns:
+        numpy.ndarray: the coordinates as float64.
+
+    Raises:
+        ValueError: values are not numeric.
+    """
+    if np is None:
+        raise ImportError("array distances require numpy")
+    try:
+        array = np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be numeric coordinates") from None
+    return array
+
+def haversine_many(lats1, lons1, lats2, lons2, units="km"):
+    """Calculate distances between many pairs of points at once.
+
+    The arguments are validated once as whole arrays, then every distance
+    is computed with vectorized NumPy operations. Arrays must have
+    broadcastable shapes, so a scalar for lats1 and lons1 gives distances
+    from one point to many.
+
+    Args:
+        lats1, lons1 (array-like of float): first points in decimal degrees.
+        lats2, lons2 (array-like of float): second points in decimal degrees.
+        units (str): units of return value. Should be "km" for kilometers or "mi" for miles. (Default: "km")
+
+    Returns:
+        numpy.ndarray of float: the distance between each pair of points in
+        the requested units, in the broadcast shape of the arguments.
+
+    Raises:
+        ValueError: units are invalid, coordinates are not numeric or the
+            shapes do not broadcast.
+    """
+    R = earth_radius(units)
+    lat1 = np.radians(as_coordinates(lats1, "lats1"))
+    lon1 = np.radians(as_coordinates(lons1, "lons1"))
+    lat2 = np.radians(as_coordinates(lats2, "lats2"))
+    lon2 = np.radians(as_coordinates(lons2, "lons2"))
+    try:
+        np.broadcast_shapes(lat1.shape, lon1.shape, lat2.shape, lon2.shape)
+    except ValueError:
+        raise ValueError("coordinate arrays have incompatible shapes") from None
+
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    # rounding can push a just past 1 for antipodal points
+    return 2 * R * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+def haversine_from(origin, lats, lons, units="km"):
+    """Calculate distances from one point to many points.
+
+    Args:
+        origin (tuple of float, float or Point): the origin (lat, lon) in decimal degrees.
+        lats, lons (array-like of float): the other points in decimal degrees.
+        units (str): units of return value. Should be "km" for kilometers or "mi" for miles. (Default: "km")
+
+    Returns:
+        numpy.ndarray of float: the distance from origin to each point.
+    """
+    if len(origin) != 2:
+        raise ValueError("origin should be a tuple of two floats")
+    lat, lon = origin
+    return haversine_many(lat, lon, lats, lons, units)
+
+class TileGrid:
+    """Two sets of points prepared for tiled all-pairs distance computation.
+
+    Latitudes and longitudes are converted to radians and the cosine of
+    each latitude is computed once, not once per tile.
+
+    Attributes:
+        lat1, lon1, cos1 (numpy.ndarray): first points, in radians, and
+            the cosines of their latitudes.
+        lat2, lon2, cos2 (numpy.ndarray): the same for the second points.
+        symmetric (bool): True if both sets are the same points.
+        radius (float): Earth radius in the requested units.
+        tile_size (int): rows and columns per tile.
+    """
+    def __init__(self, lats1, lons1, lats2=None, lons2=None, units="km",
+                 tile_size=TILE_SIZE):
+        self.radius = earth_radius(units)
+        self.lat1 = np.radians(as_coordinates(lats1, "lats1")).ravel()
+        self.lon1 = np.radians(as_coordinates(lons1, "lons1")).ravel()
+        if len(self.lat1) != len(self.lon1):
+            raise ValueError("lats1 and lons1 should have the same length")
+        self.symmetric = lats2 is None and lons2 is None
+        if self.symmetric:
+            self.lat2, self.lon2 = self.lat1, self.lon1
+        else:
+            self.lat2 = np.radians(as_coordinates(lats2, "lats2")).ravel()
+            self.lon2 = np.radians(as_coordinates(lons2, "lons2")).ravel()
+            if len(self.lat2) != len(self.lon2):
+                raise ValueError("lats2 and lons2 should have the same length")
+        self.cos1 = np.cos(self.lat1)
+        self.cos2 = self.cos1 if self.symmetric else np.cos(self.lat2)
+        if tile_size < 1:
+            raise ValueError("tile_size should be at least 1")
+        self.tile_size = tile_size
+
+    @property
+    def shape(self):
+        """The shape of the full distance matrix."""
+        return len(self.lat1), len(self.lat2)
+
+    def tiles(self, upper_only=False):
+        """Return the (row, column) offsets of every tile.
+
+        Args:
+            upper_only (bool): for symmetric grids, skip tiles entirely
+                below the diagonal.
+        """
+        rows, cols = self.shape
+        step = self.tile_size
+        return [(r, c) for r in range(0, rows, step)
+                for c in range(r if upper_only else 0, cols, step)]
+
+    def tile(self, row, col):
+        """Compute one tile of the distance matrix.
+
+        Args:
+            row, col (int): offsets of the tile's first row and column.
+
+        Returns:
+            numpy.ndarray of float: distances from points row:row+tile_size
+            of the first set to points col:col+tile_size of the second.
+        """
+        r = slice(row, row + self.tile_size)
+        c = slice(col, col + self.tile_size)
+        lat1 = self.lat1[r, None]
+        a = (np.sin((self.lat2[c] - lat1) / 2) ** 2
+             + self.cos1[r, None] * self.cos2[c]
+             * np.sin((self.lon2[c] - self.lon1[r, None]) / 2) ** 2)
+        np.minimum(a, 1.0, out=a)
+        np.sqrt(a, out=a)
+        np.arcsin(a, out=a)
+        a *= 2 * self.radius
+        return a
+
+def map_tiles(func, tiles, workers=1):
+    """Apply func to each tile in a thread pool, yielding results in order.
+
+    NumPy releases the GIL inside its array operations, so threads run
+    tiles on several cores without copying the points to other processes.
+    At most two tiles per worker are in flight, which bounds memory.
+
+    Args:
+        func (callable): called as func(row, col).
+        tiles (list of (int, int)): tile offsets.
+        workers (int): number of threads.
+
+    Yields:
+        tuple of (int, int, object): row, col and func's result.
+    """
+    if workers <= 1:
+        for row, col in tiles:
+            yield row, col, func(row, col)
+        return
+    with ThreadPoolExecutor(workers) as executor:
+        pending = deque()
+        for row, col in tiles:
+            pending.append((row, col, executor.submit(func, row, col)))
+            if len(pending) >= 2 * workers:
+                row, col, future = pending.popleft()
+                yield row, col, future.result()
+        while pending:
+            row, col, future = pending.popleft()
+            yield row, col, future.result()
+
+def pairwise_distances(lats1, lons1, lats2=None, lons2=None, units="km",
+                       callback=None, out=None, dtype="float64",
+                       tile_size=TILE_SIZE, workers=1):
+    """Calculate all distances between two sets of points, tile by tile.
+
+    Only a few tiles are held in memory at a time. Each finished tile is
+    passed to callback and/or written into a memory-mapped .npy file, so
+    matrices far larger than RAM can be produced.
+
+    Args:
+        lats1, lons1 (array-like of float): first points in decimal degrees.
+        lats2, lons2 (array-like of float): second points in decimal
+            degrees; if omitted, distances among the first points.
+        units (str): units of return value. Should be "km" for kilometers or "mi" for miles. (Default: "km")
+        callback (callable): called as callback(row, col, tile) for each
+            tile, in row-major order.
+        out (str): path of a .npy file to write the full matrix to.
+        dtype (str): element type of the out file, e.g. "float32".
+        tile_size (int): rows and columns per tile.
+        workers (int): number of threads computing tiles.
+
+    Returns:
+        numpy.memmap: the matrix mapped from out, or None without out.
+
+    Raises:
+        ValueError: neither callback nor out was given.
+    """
+    if callback is None and out is None:
+        raise ValueError("pass a callback and/or an out file")
+    grid = TileGrid(lats1, lons1, lats2, lons2, units, tile_size)
+    matrix = None
+    if out is not None:
+        matrix = np.lib.format.open_memmap(out, mode="w+", dtype=dtype,
+                                           shape=grid.shape)
+    for row, col, tile in map_tiles(grid.tile, grid.tiles(), workers):
+        if callback is not None:
+            callback(row, col, tile)
+        if matrix is not None:
+            matrix[row:row + tile.shape[0], col:col + tile.shape[1]] = tile
+    if matrix is not None:
+        matrix.flush()
+    return matrix
+
+def pairs_within(lats1, lons1, radius, lats2=None, lons2=None, units="km",
+                 tile_size=TILE_SIZE, workers=1):
+    """Find every pair of points no more than radius apart.
+
+    Tiles are computed as in pairwise_distances() but only the matching
+    pairs are kept, so the result is sparse. Among a single set of points
+    only tiles on or above the diagonal are computed, and each pair is
+    reported once with i < j.
+
+    Args:
+        lats1, lons1 (array-like of float): first points in decimal degrees.
+        radius (float): maximum distance in units.
+        lats2, lons2 (array-like of float): second points in decimal
+            degrees; if omitted, pairs among the first points.
+        units (str): units of radius and the returned distances.
+        tile_size (int): rows and columns per tile.
+        workers (int): number of threads computing tiles.
+
+    Returns:
+        tuple of numpy.ndarray: indices i into the first points, indices j
+        into the second, and the distance of each pair, sorted by i then j.
+    """
+    grid = TileGrid(lats1, lons1, lats2, lons2, units, tile_size)
+
+    def matches(row, col):
+        tile = grid.tile(row, col)
+        mask = tile <= radius
+        if grid.symmetric and row == col:
+            mask &= np.triu(np.ones(tile.shape, dtype=bool), k=1)
+        i, j = np.nonzero(mask)
+        return i + row, j + col, tile[i, j]
+
+    found = [result for _, _, result in
+             map_tiles(matches, grid.tiles(upper_only=grid.symmetric),
+                       workers)]
+    if not found:
+        empty = np.empty(0, dtype=np.intp)
+        return empty, empty, np.empty(0)
+    i, j, d = (np.concatenate(parts) for parts in zip(*found))
+    order = np.lexsort((j, i))
+    return i[order], j[order], d[order]
+
+def parse_pairs(lines, format, columns=(0, 1, 2, 3)):
+    """Parse lines of coordinate pairs into a 4-column array.
+
+    A batch is parsed in one vectorized call when possible. If that fails,
+    lines are parsed one by one and bad lines become rows of NaN.
+
+    Args:
+        lines (list of str): CSV rows or JSON objects, one per line.
+        format (str): "csv" or "jsonl".
+        columns (tuple of int): CSV column of each of PAIR_FIELDS.
+
+    Returns:
+        tuple of (numpy.ndarray, int): the coordinates, one row per line,
+        and the number of bad lines.
+    """
+    if format == "csv":
+        try:
+            rows = np.loadtxt(lines, delimiter=",", usecols=columns,
+                              comments=None, ndmin=2).reshape(-1, 4)
+        except ValueError:
+            pass
+        else:
+            # every line must give one row, or output would be misaligned
+            if len(rows) == len(lines):
+                return rows, 0
+    rows = np.full((len(lines), 4), np.nan)
+    bad = 0
+    for i, line in enumerate(lines):
+        try:
+            if format == "csv":
+                fields = line.split(",")
+                rows[i] = [float(fields[c]) for c in columns]
+            else:
+                record = json.loads(line)
+                rows[i] = [float(record[f]) for f in PAIR_FIELDS]
+        except (ValueError, TypeError, KeyError, IndexError):
+            rows[i] = np.nan
+            bad += 1
+    return rows, bad
+
+def distance_batch(lines, format, columns, units):
+    """Parse a batch of lines and format the distance of each pair.
+
+    Args:
+        lines (list of str): input lines (see parse_pairs()).
+        format (str): "csv" or "jsonl".
+        columns (tuple of int): CSV column of each of PAIR_FIELDS.
+        units (str): "km" or "mi".
+
+    Returns:
+        tuple of (str, int, int): the distances, one per line ("nan" for
+        bad lines), the number of lines and the number of bad lines.
+    """
+    rows, bad = parse_pairs(lines, format, columns)
+    with np.errstate(invalid="ignore"):
+        distances = haversine_many(rows[:, 0], rows[:, 1], rows[:, 2],
+                                   rows[:, 3], units)
+    text = "\n".join(map("{:.6f}".format, distances.tolist()))
+    return text + "\n" if text else text, len(rows), bad
+
+def csv_columns(header):
+    """Find PAIR_FIELDS in a CSV header line.
+
+    Returns:
+        tuple of int: the column of each field, or None if the line is
+        not a header, i.e. names none of PAIR_FIELDS (it may be a data
+        row, possibly a bad one).
+
+    Raises:
+        ValueError: the line is a header but lacks some of PAIR_FIELDS.
+    """
+    names = [name.strip().lower() for name in header.split(",")]
+    if not set(names) & set(PAIR_FIELDS):
+        return None
+    missing = [f for f in PAIR_FIELDS if f not in names]
+    if missing:
+        raise ValueError(f"CSV header lacks {', '.join(missing)}")
+    return tuple(names.index(f) for f in PAIR_FIELDS)
+
+def stream_distances(infile, outfile, format="csv", units="km",
+                     batch_size=BATCH_SIZE, workers=1):
+    """Write the distance of every coordinate pair in a stream.
+
+    Lines are read in batches; each batch is parsed and computed with
+    vectorized NumPy, in a pool of processes if workers > 1. At most two
+    batches per worker are in flight, so memory use stays constant no
+    matter how long the input is, and output keeps input order.
+
+    Args:
+        infile (file): text input of CSV rows (with or without a header
+            naming PAIR_FIELDS) or JSON objects with keys PAIR_FIELDS.
+        outfile (file): text output; one distance is written per input
+            pair, "nan" for lines that could not be parsed.
+        format (str): "csv" or "jsonl".
+        units (str): "km" or "mi".
+        batch_size (int): lines per batch.
+        workers (int): number of worker processes.
+
+    Returns:
+        tuple of (int, int): number of pairs and number of bad lines.
+    """
+    earth_radius(units)
+    if format not in ("csv", "jsonl"):
+        raise ValueError("format should be 'csv' or 'jsonl'")
+    lines = (line for line in infile if line.strip())
+    columns = (0, 1, 2, 3)
+    if format == "csv":
+        first = next(lines, None)
+        if first is None:
+            return 0, 0
+        header = csv_columns(first)
+        if header is None:
+            lines = chain([first], lines)
+        else:
+            columns = header
+    batches = iter(lambda: list(islice(lines, batch_size)), [])
+    pairs = bad = 0
+
+    def write(result):
+        nonlocal pairs, bad
+        text, count, errors = result
+        outfile.write(text)
+        pairs += count
+        bad += errors
+
+    if workers <= 1:
+        for batch in batches:
+            write(distance_batch(batch, format, columns, units))
+        return pairs, bad
+    with ProcessPoolExecutor(workers) as executor:
+        pending = deque()
+        for batch in batches:
+            pending.append(executor.submit(distance_batch, batch, format,
+                                           columns, units))
+            if len(pending) >= 2 * workers:
+                write(pending.popleft().result())
+        while pending:
+            write(pending.popleft().result())
+    return pairs, bad
+
+def main(file_path=None, format=None, units="km", output=None, workers=1,
+         batch_size=BATCH_SIZE, buffer_size=BUFFER_SIZE, summary=False):
+    """Compute distances for a file of coordinate pairs.
+
+    Args:
+        file_path (str): input file, or None/"-" for stdin.
+        format (str): "csv" or "jsonl"; if None, ".jsonl" and ".json"
+            files are JSONL and everything else is CSV.
+        units (str): "km" or "mi".
+        output (str): output file, or None/"-" for stdout.
+        workers (int): number of worker processes.
+        batch_size (int): lines per batch.
+        buffer_size (int): size of the read and write buffers in bytes.
+        summary (bool): if True, report throughput on stderr.
+
+    Side effects:
+        Writes to stdout or output, and to stderr if summary is True.
+    """
+    start = time.perf_counter()
+    stdin = file_path in (None, "-")
+    if format is None:
+        format = ("jsonl" if not stdin
+                  and file_path.endswith((".jsonl", ".json")) else "csv")
+    infile = (open(sys.stdin.fileno(), buffering=buffer_size, closefd=False)
+              if stdin else open(file_path, buffering=buffer_size))
+    if output in (None, "-"):
+        sys.stdout.flush()
+        outfile = open(sys.stdout.fileno(), "w", buffering=buffer_size,
+                       closefd=False)
+    else:
+        outfile = open(output, "w", buffering=buffer_size)
+    with infile, outfile:
+        pairs, bad = stream_distances(infile, outfile, format, units,
+                                      batch_size, workers)
+    if summary:
+        seconds = time.perf_counter() - start
+        rate = pairs / seconds if seconds else 0
+        print(f"{pairs:,} pairs ({bad:,} bad) in {seconds:.2f} s "
+              f"({rate:,.0f} pairs/sec)", file=sys.stderr)
+
+def parse_args(arglist):
+    """Parse command-line arguments."""
+    parser = ArgumentParser(description="Compute great-circle distances for"
+                                        " a file of coordinate pairs.")
+    parser.add_argument("file", nargs="?", default="-",
+                        help="CSV or JSONL file of lat1, lon1, lat2, lon2"
+                             " (default: stdin)")
+    parser.add_argument("--format", choices=["csv", "jsonl"],
+                        help="input format (default: from the file name,"
+                             " else csv)")
+    parser.add_argument("--units", choices=sorted(EARTH_RADIUS), default="km",
+                        help="units of the distances (default: km)")
+    parser.add_argument("--output", "-o", help="output file (default: stdout)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of processes to compute with (default: 1)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help="pairs per vectorized batch")
+    parser.add_argument("--buffer-size", type=int, default=BUFFER_SIZE,
+                        help="read and write buffer size in bytes")
+    parser.add_argument("--summary", action="store_true",
+                        help="print throughput to stderr")
+    return parser.parse_args(arglist)
+
+if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+    main(args.file, args.format, args.units, args.output, args.workers,
+         args.batch_size, args.buffer_size, args.summary)
@@ -1,32 +1,564 @@
 import argparse
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+import json
+import os
+import random
 import requests
 import sys
+import tempfile
+import time
 
-def get_holidays(country_code, year):
-    api_url = f"https://date.nager.at/Api/v1/Get/{country_code}/{year}"
-    
+# URL template of the public holidays API
+API_URL = "https://date.nager.at/Api/v1/Get/{country_code}/{year}"
+
+# default directory of the on-disk response cache
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "holidays")
+
+# default number of seconds a cached response is used without revalidation
+CACHE_TTL = 7 * 24 * 3600
+
+# seconds to wait for the API before giving up
+TIMEOUT = 10
+
+# default number of concurrent requests of fetch_many()
+CONCURRENCY = 8
+
+# default number of retries of a throttled or failed request
+RETRIES = 4
+
+# base and maximum delay in seconds between retries
+BACKOFF = 0.5
+MAX_BACKOFF = 30
+
+# response statuses that are worth retrying
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# days of the week (Monday is 0) that are not business days
+WEEKEND = (5, 6)
+
+# day flags of HolidayCalendar
+WORKDAY, HOLIDAY, UNLOADED = 0, 1, 255
+
+class HolidayCache:
+    """An on-disk cache of holiday API responses, one JSON file per
+    (country_code, year).
+
+    Each entry keeps the holidays along with the time they were fetched and
+    the response's ETag and Last-Modified headers, so an expired entry can
+    be revalidated with a conditional request instead of downloaded again.
+
+    Attributes:
+        directory (str): where the entries are stored.
+        ttl (float): seconds an entry stays fresh after it is fetched or
+            revalidated.
+    """
+    def __init__(self, directory=CACHE_DIR, ttl=CACHE_TTL):
+        self.directory = directory
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, country_code, year):
+        """Return the file holding the entry for a country and year."""
+        return os.path.join(self.directory, f"{country_code.upper()}-{year}.json")
+
+    def load(self, country_code, year):
+        """Return the entry for a country and year, or None.
+
+        Returns:
+            dict: with keys "holidays", "fetched", "etag" and
+            "last_modified", or None if there is no readable entry.
+        """
+        try:
+            with open(self.path(country_code, year), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, country_code, year, entry):
+        """Store an entry, replacing any earlier one atomically."""
+        fd, temp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(temp, self.path(country_code, year))
+        except BaseException:
+            os.unlink(temp)
+            raise
+
+    def is_fresh(self, entry):
+        """Return True if an entry is younger than the TTL."""
+        return time.time() - entry["fetched"] < self.ttl
+
+def retry_delay(response, attempt, backoff=BACKOFF):
+    """Return how long to wait before retrying a request.
+
+    The delay doubles with each attempt, with random jitter so that many
+    throttled clients do not retry in lockstep. A Retry-After header given
+    in seconds is honoured instead.
+
+    Args:
+        response (requests.Response): the failed response, or None if no
+            response was received.
+        attempt (int): number of attempts made so far, from 1.
+        backoff (float): delay in seconds after the first attempt.
+    """
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after is not None and retry_after.isdigit():
+        return min(float(retry_after), MAX_BACKOFF)
+    delay = min(backoff * 2 ** (attempt - 1), MAX_BACKOFF)
+    return delay * random.uniform(0.5, 1)
+
+def request(get, url, headers, timeout=TIMEOUT, retries=0, backoff=BACKOFF,
+            stats=None):
+    """Make a GET request, retrying on throttling, server errors and
+    connection failures with exponential backoff.
+
+    Args:
+        get (callable): requests.get or a Session's get method.
+        url (str): the URL.
+        headers (dict): request headers.
+        timeout (float): seconds to wait for each attempt.
+        retries (int): maximum number of retries.
+        backoff (float): delay in seconds before the first retry.
+        stats (dict): if given, "attempts" is set to the number of
+            attempts made.
+
+    Returns:
+        requests.Response: the last response, which may still be an error.
+
+    Raises:
+        requests.exceptions.RequestException: the last attempt failed to
+            get a response.
+    """
+    attempt = 0
+    while True:
+        attempt += 1
+        if stats is not None:
+            stats["attempts"] = attempt
+        try:
+            response = get(url, headers=headers, timeout=timeout)
+        except (requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout):
+            if attempt > retries:
+                raise
+            response = None
+        else:
+            if response.status_code not in RETRY_STATUSES or attempt > retries:
+                return response
+        time.sleep(retry_delay(response, attempt, backoff))
+
+def fetch_holidays(country_code, year, cache=None, offline=False,
+                   session=None, api_url=API_URL, timeout=TIMEOUT,
+                   retries=0, backoff=BACKOFF, stats=None):
+    """Return the public holidays of a country in a year.
+
+    With a cache, a fresh entry is returned without any request. An
+    expired entry is revalidated with If-None-Match/If-Modified-Since, and
+    a 304 response only renews it. If the API cannot be reached, an
+    expired entry is returned rather than nothing.
+
+    Args:
+        country_code (str): two-letter country code.
+        year (int): four-digit year.
+        cache (HolidayCache): the response cache, or None for no caching.
+        offline (bool): if True, never make a request; cached entries are
+            returned however old they are.
+        session (requests.Session): session to make requests with, for
+            connection reuse (default: a one-off connection).
+        api_url (str): URL template with {country_code} and {year} fields.
+        timeout (float): seconds to wait for the API.
+        retries (int): maximum number of retries on 429 and 5xx responses
+            and connection failures.
+        backoff (float): delay in seconds before the first retry.
+        stats (dict): if given, "source" is set to "cache", "network",
+            "revalidated" or "stale", and "attempts" to the number of
+            requests made.
+
+    Returns:
+        list of dict: the holidays as returned by the API.
+
+    Raises:
+        LookupError: offline is True and there is no cached entry.
+        requests.exceptions.RequestException: the request failed and there
+            is no cached entry.
+    """
+    if stats is None:
+        stats = {}
+    stats["source"], stats["attempts"] = "cache", 0
+    entry = cache.load(country_code, year) if cache is not None else None
+    if entry is not None and (offline or cache.is_fresh(entry)):
+        return entry["holidays"]
+    if offline:
+        raise LookupError(f"no cached holidays for {country_code} {year}")
+
+    headers = {}
+    if entry is not None:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+    url = api_url.format(country_code=country_code, year=year)
     try:
-        response = requests.get(api_url)
-        response.raise_for_status()
-        holidays = response.json()
-        
+        response = request((session or requests).get, url, headers,
+                           timeout, retries, backoff, stats)
+        if response.status_code != 304 or entry is None:
+            response.raise_for_status()
+            entry = {"holidays": response.json(),
+                     "etag": response.headers.get("ETag"),
+                     "last_modified": response.headers.get("Last-Modified")}
+            stats["source"] = "network"
+        else:
+            stats["source"] = "revalidated"
+    except requests.exceptions.RequestException:
+        if entry is None:
+            raise
+        stats["source"] = "stale"
+        return entry["holidays"]
+
+    entry["fetched"] = time.time()
+    if cache is not None:
+        cache.save(country_code, year, entry)
+    return entry["holidays"]
+
+def make_session(pool_size=CONCURRENCY):
+    """Create a requests.Session whose connection pool holds pool_size
+    connections per host, so concurrent requests reuse connections.
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size,
+                                            pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def fetch_many(pairs, cache=None, offline=False, workers=CONCURRENCY,
+               retries=RETRIES, backoff=BACKOFF, api_url=API_URL,
+               timeout=TIMEOUT):
+    """Fetch the holidays of many (country_code, year) pairs concurrently.
+
+    Requests run in a pool of workers threads sharing one session, so at
+    most workers requests are in flight and connections are reused.
+    Throttled (429) and failed (5xx) requests are retried with exponential
+    backoff.
+
+    Args:
+        pairs (iterable of (str, int)): the countries and years.
+        cache (HolidayCache): the response cache, or None for no caching.
+        offline (bool): if True, only use cached holidays.
+        workers (int): maximum number of concurrent requests.
+        retries (int): maximum number of retries of each request.
+        backoff (float): delay in seconds before the first retry.
+        api_url (str): URL template with {country_code} and {year} fields.
+        timeout (float): seconds to wait for each attempt.
+
+    Returns:
+        tuple of (dict, list): the results, mapping each (country_code,
+        year) to its list of holidays or to the exception that prevented
+        fetching it, and one metrics dict per pair with keys
+        "country_code", "year", "seconds", "attempts", "source" and
+        "error", in the order of pairs.
+    """
+    pairs = list(dict.fromkeys(pairs))
+    with make_session(workers) as session:
+        def fetch(pair):
+            country_code, year = pair
+            stats = {}
+            start = time.perf_counter()
+            try:
+                result = fetch_holidays(country_code, year, cache, offline,
+                                        session, api_url, timeout, retries,
+                                        backoff, stats)
+                error = None
+            except (requests.exceptions.RequestException, LookupError) as e:
+                result = error = e
+                stats["source"] = "error"
+            stats.update(country_code=country_code, year=year,
+                         seconds=time.perf_counter() - start,
+                         error=None if error is None else str(error))
+            return result, stats
+
+        with ThreadPoolExecutor(workers) as executor:
+            fetched = list(executor.map(fetch, pairs))
+    results = {pair: result for pair, (result, _) in zip(pairs, fetched)}
+    return results, [stats for _, stats in fetched]
+
+def latency_summary(metrics):
+    """Summarize the metrics returned by fetch_many().
+
+    Returns:
+        str: counts by source, retries, and latency percentiles.
+    """
+    sources = {}
+    for m in metrics:
+        sources[m["source"]] = sources.get(m["source"], 0) + 1
+    retried = sum(max(m["attempts"] - 1, 0) for m in metrics)
+    lines = [f"{len(metrics)} requests: "
+             + ", ".join(f"{n} {source}" for source, n in sorted(sources.items()))
+             + f"; {retried} retries"]
+    latencies = sorted(m["seconds"] for m in metrics)
+    if latencies:
+        values = []
+        for p in (50, 90, 99):
+            rank = max(1, -(-p * len(latencies) // 100))
+            values.append(f"p{p} {latencies[rank - 1] * 1000:.1f} ms")
+        values.append(f"max {latencies[-1] * 1000:.1f} ms")
+        lines.append("latency: " + ", ".join(values))
+    return "\n".join(lines)
+
+def parse_countries(value):
+    """Parse a comma-separated list of country codes, e.g. "US,FR"."""
+    return [code.strip() for code in value.split(",") if code.strip()]
+
+def parse_years(value):
+    """Parse a year or an inclusive range of years, e.g. "2020-2029"."""
+    try:
+        first, _, last = value.partition("-")
+        years = range(int(first), int(last or first) + 1)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid year or range: {value!r}")
+    if not years:
+        raise argparse.ArgumentTypeError(f"empty range of years: {value!r}")
+    return list(years)
+
+def get_many(country_codes, years, cache=None, offline=False,
+             workers=CONCURRENCY, retries=RETRIES, metrics=False):
+    """Fetch holidays for every country and year and print a summary.
+
+    Side effects:
+        Prints the number of holidays or the error for each country and
+        year, then latency metrics on stderr if metrics is True.
+    """
+    pairs = [(code, year) for code in country_codes for year in years]
+    results, stats = fetch_many(pairs, cache, offline, workers, retries)
+    for (code, year), result in results.items():
+        if isinstance(result, Exception):
+            print(f"{code} {year}: error: {result}")
+        else:
+            print(f"{code} {year}: {len(result)} holidays")
+    if metrics:
+        print(latency_summary(stats), file=sys.stderr)
+
+class HolidayCalendar:
+    """Holidays of several countries indexed for fast date queries.
+
+    For each country, one byte per day from January 1 of the first loaded
+    year to December 31 of the last says whether the day is a holiday, so
+    is_holiday() is a subtraction and an index. A sorted list of the
+    ordinals of holidays falling on weekdays lets business_days_between()
+    count holidays in a range with two binary searches.
+
+    Only nationwide holidays are indexed unless regional=True, because a
+    holiday of a few states or counties is not a day off for the country.
+
+    Attributes:
+        weekend (frozenset of int): weekdays (Monday is 0) that are never
+            business days.
+        regional (bool): whether regional holidays are indexed.
+        flags (dict of str: bytearray): per-day WORKDAY/HOLIDAY/UNLOADED
+            flags of each country.
+        starts (dict of str: int): ordinal of the first day of each
+            country's flags.
+        weekday_holidays (dict of str: list of int): sorted ordinals of
+            each country's holidays that are not on a weekend.
+    """
+    def __init__(self, weekend=WEEKEND, regional=False):
+        self.weekend = frozenset(weekend)
+        self.regional = regional
+        self.flags = {}
+        self.starts = {}
+        self.weekday_holidays = {}
+
+    @classmethod
+    def fetch(cls, country_codes, years, cache=None, offline=False,
+              workers=CONCURRENCY, api_url=API_URL, weekend=WEEKEND,
+              regional=False):
+        """Fetch holidays for every country and year into a new calendar.
+
+        Args:
+            country_codes (iterable of str): two-letter country codes.
+            years (iterable of int): four-digit years.
+            cache (HolidayCache): the response cache, or None for no caching.
+            offline (bool): if True, only use cached holidays.
+            workers (int): maximum number of concurrent requests.
+            api_url (str): URL template with {country_code} and {year} fields.
+            weekend (iterable of int): weekdays that are not business days.
+            regional (bool): whether to index regional holidays.
+
+        Returns:
+            HolidayCalendar: the calendar.
+
+        Raises:
+            LookupError, requests.exceptions.RequestException: the holidays
+                of some country and year could not be fetched.
+        """
+        calendar = cls(weekend, regional)
+        pairs = [(code, year) for code in country_codes for year in years]
+        results, _ = fetch_many(pairs, cache, offline, workers,
+                                api_url=api_url)
+        for (code, year), result in results.items():
+            if isinstance(result, Exception):
+                raise result
+            calendar.add(code, year, result)
+        return calendar
+
+    def add(self, country_code, year, holidays):
+        """Index a country's holidays for a year, replacing earlier ones.
+
+        Args:
+            country_code (str): two-letter country code.
+            year (int): four-digit year.
+            holidays (list of dict): holidays as returned by fetch_holidays().
+        """
+        code = country_code.upper()
+        first, last = date(year, 1, 1).toordinal(), date(year, 12, 31).toordinal()
+        flags = self.flags.get(code, bytearray())
+        start = self.starts.get(code, first)
+        new_start = min(start, first)
+        new_end = max(start + len(flags), last + 1)
+        if (new_start, new_end) != (start, start + len(flags)):
+            grown = bytearray([UNLOADED]) * (new_end - new_start)
+            grown[start - new_start:start - new_start + len(flags)] = flags
+            flags, start = grown, new_start
+        flags[first - start:last + 1 - start] = bytes(last + 1 - first)
+        for holiday in holidays:
+            if holiday.get("global") is False and not self.regional:
+                continue
+            day = date.fromisoformat(holiday["date"]).toordinal()
+            if first <= day <= last:
+                flags[day - start] = HOLIDAY
+        self.flags[code], self.starts[code] = flags, start
+        self.weekday_holidays[code] = [
+            start + i for i, flag in enumerate(flags)
+            if flag == HOLIDAY and (start + i - 1) % 7 not in self.weekend]
+
+    def flag(self, day, country_code):
+        """Return the flag of a day, raising LookupError if not loaded."""
+        code = country_code.upper()
+        flags = self.flags.get(code)
+        if flags is not None:
+            i = day.toordinal() - self.starts[code]
+            if 0 <= i < len(flags) and flags[i] != UNLOADED:
+                return flags[i]
+        raise LookupError(f"no holidays loaded for {code} {day.year}")
+
+    def is_holiday(self, day, country_code):
+        """Return True if a date is a holiday in a country.
+
+        Args:
+            day (datetime.date): the date.
+            country_code (str): two-letter country code.
+
+        Raises:
+            LookupError: the country's holidays for that year are not loaded.
+        """
+        return self.flag(day, country_code) == HOLIDAY
+
+    def is_business_day(self, day, country_code):
+        """Return True if a date is neither a weekend day nor a holiday."""
+        return (day.weekday() not in self.weekend
+                and self.flag(day, country_code) != HOLIDAY)
+
+    def next_business_day(self, day, country_code):
+        """Return the first business day after a date.
+
+        Raises:
+            LookupError: the search ran into a year that is not loaded.
+        """
+        if len(self.weekend) >= 7:
+            raise ValueError("every day is a weekend day")
+        day += timedelta(days=1)
+        while not self.is_business_day(day, country_code):
+            day += timedelta(days=1)
+        return day
+
+    def business_days_between(self, start, end, country_code):
+        """Count the business days from start up to but not including end.
+
+        Args:
+            start, end (datetime.date): the range; if end is before start,
+                the count is negative.
+            country_code (str): two-letter country code.
+
+        Raises:
+            LookupError: some year in the range is not loaded.
+        """
+        if end < start:
+            return -self.business_days_between(end, start, country_code)
+        if end == start:
+            return 0
+        self.flag(start, country_code)
+        self.flag(end - timedelta(days=1), country_code)
+        code = country_code.upper()
+        flags, offset = self.flags[code], self.starts[code]
+        first, last = start.toordinal(), end.toordinal()
+        if UNLOADED in flags[first - offset:last - offset]:
+            raise LookupError(f"no holidays loaded for {code} in part of"
+                              f" {start} to {end}")
+        weeks, extra = divmod(last - first, 7)
+        days = weeks * (7 - len(self.weekend))
+        days += sum((first + i - 1) % 7 not in self.weekend for i in range(extra))
+        holidays = self.weekday_holidays[code]
+        return days - (bisect_left(holidays, last) - bisect_left(holidays, first))
+
+def get_holidays(country_code, year, cache=None, offline=False):
+    """Print and return the public holidays of a country in a year.
+
+    Args:
+        country_code (str): two-letter country code.
+        year (int): four-digit year.
+        cache (HolidayCache): the response cache, or None for no caching.
+        offline (bool): if True, only use cached holidays.
+
+    Returns:
+        list of dict: the holidays, or None if they could not be found.
+
+    Side effects:
+        Prints one "date: name" line per holiday, or an error message.
+    """
+    try:
+        holidays = fetch_holidays(country_code, year, cache, offline)
+
         for holiday in holidays:
             date = holiday['date']
             local_name = holiday.get('localName', 'No translation')
             english_name = holiday.get('name', local_name)
-            
+
             print(f"{date}: {english_name}")
-    
-    except requests.exceptions.RequestException as e:
+
+        return holidays
+
+    except (requests.exceptions.RequestException, LookupError) as e:
         print(f"Error finding holidays: {e}")
 
 def parse_args(args):
     parser = argparse.ArgumentParser(description="Get holidays for a country and year.")
-    parser.add_argument("country_code", help="Two-letter country code")
-    parser.add_argument("year", type=int, help="Four-digit year")
+    parser.add_argument("country_codes", type=parse_countries,
+                        help="Two-letter country code, or several separated by commas")
+    parser.add_argument("years", type=parse_years,
+                        help="Four-digit year, or a range such as 2020-2029")
+    parser.add_argument("--cache-dir", default=CACHE_DIR,
+                        help="directory of the response cache (default: %(default)s)")
+    parser.add_argument("--ttl", type=float, default=CACHE_TTL,
+                        help="seconds before a cached response is revalidated (default: %(default)s)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always query the API and store nothing")
+    parser.add_argument("--offline", action="store_true",
+                        help="only use cached responses, however old")
+    parser.add_argument("--workers", type=int, default=CONCURRENCY,
+                        help="concurrent requests for several countries or years (default: %(default)s)")
+    parser.add_argument("--retries", type=int, default=RETRIES,
+                        help="retries of throttled or failed requests (default: %(default)s)")
+    parser.add_argument("--metrics", action="store_true",
+                        help="print request latency metrics to stderr")
     return parser.parse_args(args)
 
 if __name__ == "__main__":
     args = parse_args(sys.argv[1:])
-    get_holidays(args.country_code, args.year)
-
+    cache = None if args.no_cache else HolidayCache(args.cache_dir, args.ttl)
+    if len(args.country_codes) == 1 and len(args.years) == 1:
+        get_holidays(args.country_codes[0], args.years[0], cache, args.offline)
+    else:
+        get_many(args.country_codes, args.years, cache, args.offline,
+                 args.workers, args.retries, args.metrics)
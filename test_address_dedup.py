@@ -0,0 +1,69 @@
+from address_dedup import (Deduplicator, canonical_key, normalize_address,
+                           normalize_text, split_street)
+
+
+def address(house_number, street, city="Chelmsford", state="MA",
+            zip="01824"):
+    return {"house_number": house_number, "street": street, "city": city,
+            "state": state, "zip": zip}
+
+
+def test_normalize_text():
+    """ Test casefolding, punctuation and abbreviation. """
+    assert normalize_text("66-4 Parkhurst  Road.") == "66-4 parkhurst rd"
+    assert normalize_text("North Main Street") == "n main st"
+
+
+def test_split_street():
+    """ Test splitting directions and suffixes off street names. """
+    assert split_street("s meridian st") == ("s", "meridian", "st", "")
+    assert split_street("washington ave nw") == ("", "washington", "ave", "nw")
+    assert split_street("st charles ave") == ("", "st charles", "ave", "")
+    assert split_street("n st") == ("n", "st", "", "")
+    assert split_street("broadway") == ("", "broadway", "", "")
+
+
+def test_canonical_key_collapses_variants():
+    """ Test that suffix variants share a canonical key. """
+    rd = normalize_address(address("66-4", "Parkhurst Rd"))
+    road = normalize_address(address("66-4", "Parkhurst Road"))
+    other = normalize_address(address("66-5", "Parkhurst Road"))
+    assert canonical_key(rd) == canonical_key(road)
+    assert canonical_key(rd) != canonical_key(other)
+    assert len(canonical_key(rd)) == 16
+
+
+def test_deduplicator():
+    """ Test exact, near and non-duplicates across a stream. """
+    dedup = Deduplicator()
+    assert dedup.check(address("66-4", "Parkhurst Rd")) == "unique"
+    assert dedup.check(address("66-4", "Parkhurst Road")) == "exact"
+    assert dedup.check(address("66-4", "Parkhust Road")) == "near"
+    # same street, different block (zip) or house number: not duplicates
+    assert dedup.check(address("66-4", "Parkhurst Rd", zip="01825")) == \
+        "unique"
+    assert dedup.check(address("70", "Parkhurst Rd")) == "unique"
+    assert (dedup.seen, dedup.exact, dedup.near) == (5, 1, 1)
+
+
+def test_unique_without_near_matching():
+    """ Test that threshold 1 only removes exact duplicates. """
+    addresses = [address("1", "Main St"), address("1", "Main Street"),
+                 address("1", "Mian St")]
+    assert list(Deduplicator(threshold=1).unique(addresses)) == \
+        [addresses[0], addresses[2]]
+
+
+def test_directions_and_suffixes_are_not_near_duplicates():
+    """ Test that streets differing only in direction or suffix are kept. """
+    dedup = Deduplicator()
+    streets = ["E Washington St", "W Washington St", "North Meridian Street",
+               "South Meridian Street", "Washington Ave", "Washington St",
+               "Washington St NW", "Washington St SW"]
+    for street in streets:
+        assert dedup.check(address("100", street, "Indianapolis", "IN",
+                                   "46204")) == "unique"
+    assert dedup.check(address("100", "E Washingtn St", "Indianapolis", "IN",
+                               "46204")) == "near"
+    assert dedup.check(address("100", "Washingtn Ave", "Indianapolis", "IN",
+                               "46204")) == "near"
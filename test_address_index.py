@@ -0,0 +1,59 @@
+from address_index import Address, AddressIndex
+import os
+import pytest
+
+
+ADDRESSES_TXT = os.path.join(os.path.dirname(__file__), "addresses.txt")
+
+
+@pytest.fixture
+def index():
+    return AddressIndex([
+        {"house_number": "30", "street": "Memorial Drive", "city": "Avon",
+         "state": "MA", "zip": "02322"},
+        {"house_number": "700", "street": "Oak Street", "city": "Brockton",
+         "state": "MA", "zip": "02301"},
+        {"house_number": "12", "street": "Oakland Ave", "city": "Avon",
+         "state": "CT", "zip": "06001"},
+    ])
+
+
+def test_hash_lookups(index):
+    """ Test exact lookups by zip, state and city. """
+    assert [a.street for a in index.zip("02301")] == ["Oak Street"]
+    assert len(index.state("MA")) == 2
+    assert len(index.city("Avon")) == 2
+    assert index.city("Avon", state="CT")[0].zip == "06001"
+    assert index.zip("99999") == []
+
+
+def test_prefix_search(index):
+    """ Test case-insensitive prefix search on street and city names. """
+    assert [a.street for a in index.street_prefix("oak")] == \
+        ["Oak Street", "Oakland Ave"]
+    assert len(index.street_prefix("Oak", limit=1)) == 1
+    assert [a.city for a in index.city_prefix("BRO")] == ["Brockton"]
+    assert index.street_prefix("Z") == []
+
+    index.add({"house_number": "1", "street": "Oak Hill Rd", "city": "Avon",
+               "state": "MA", "zip": "02322"})
+    assert [a.street for a in index.street_prefix("oak")] == \
+        ["Oak Hill Rd", "Oak Street", "Oakland Ave"]
+
+
+def test_address_record(index):
+    """ Test that records are compact, read-only and round-trip. """
+    record = index.records[0]
+    assert not hasattr(record, "__dict__")
+    with pytest.raises(AttributeError):
+        record.zip = "00000"
+    assert record.as_dict()["street"] == "Memorial Drive"
+    assert record == Address.from_dict(record.as_dict())
+    assert str(record) == "30 Memorial Drive, Avon MA 02322"
+
+
+def test_from_file():
+    """ Test indexing the bundled address file. """
+    index = AddressIndex.from_file(ADDRESSES_TXT)
+    assert len(index) == 233
+    assert all(a.state == "MA" for a in index.state("MA"))
@@ -0,0 +1,61 @@
+from address_sinks import FIELDS, FileSink, open_sink
+import csv
+import json
+import pytest
+import sqlite3
+
+
+ADDRESSES = [
+    {"house_number": "30", "street": "Memorial Drive", "city": "Avon",
+     "state": "MA", "zip": "02322"},
+    {"house_number": "700", "street": "Oak Street", "city": "Brockton",
+     "state": "MA", "zip": "02301"},
+]
+
+
+def test_jsonl_sink(tmp_path):
+    """ Test that the JSON Lines sink writes one object per line. """
+    path = str(tmp_path / "out.jsonl")
+    with open_sink("jsonl", path) as sink:
+        assert sink.write_all(ADDRESSES) == 2
+    with open(path) as file:
+        assert [json.loads(line) for line in file] == ADDRESSES
+
+
+def test_csv_sink(tmp_path):
+    """ Test that the CSV sink writes a header and one row per address. """
+    path = str(tmp_path / "out.csv")
+    with open_sink("csv", path, buffer_size=16, flush_every=1) as sink:
+        sink.write_all(ADDRESSES)
+    with open(path, newline="") as file:
+        rows = list(csv.reader(file))
+    assert rows[0] == list(FIELDS)
+    assert rows[1:] == [[a[f] for f in FIELDS] for a in ADDRESSES]
+
+
+def test_sqlite_sink(tmp_path):
+    """ Test batched loading into SQLite, including a partial batch. """
+    path = str(tmp_path / "out.db")
+    with open_sink("sqlite", path, batch_size=3) as sink:
+        sink.write_all(ADDRESSES * 4)
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT COUNT(*) FROM addresses").fetchone() == (8,)
+    assert conn.execute("SELECT * FROM addresses LIMIT 1").fetchone() == \
+        tuple(ADDRESSES[0][f] for f in FIELDS)
+
+
+def test_open_sink_errors():
+    """ Test that unknown formats and path-less SQLite are rejected. """
+    with pytest.raises(ValueError):
+        open_sink("xml")
+    with pytest.raises(ValueError):
+        open_sink("sqlite")
+
+
+def test_sink_without_write_address(tmp_path):
+    """ Test that a sink lacking write_address() cannot be created. """
+    class IncompleteSink(FileSink):
+        pass
+
+    with pytest.raises(TypeError):
+        IncompleteSink(str(tmp_path / "out.txt"))
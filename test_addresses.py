@@ -0,0 +1,114 @@
+from addresses import (CachedParser, ParseStats, find_chunks, iter_addresses,
+                       parse_address, parse_addresses)
+import io
+import os
+import pytest
+
+
+ADDRESSES_TXT = os.path.join(os.path.dirname(__file__), "addresses.txt")
+
+
+def test_parse_address():
+    """ Test parsing a single line. """
+    assert parse_address("30 Memorial Drive, Avon MA 02322") == {
+        "house_number": "30", "street": "Memorial Drive",
+        "city": "Avon", "state": "MA", "zip": "02322"}
+    assert parse_address("not an address") is None
+
+
+def test_find_chunks(tmp_path):
+    """ Test that chunks cover the file and end on line boundaries. """
+    path = tmp_path / "lines.txt"
+    path.write_bytes(b"aaaa\nbb\ncccccc\nd")
+    chunks = list(find_chunks(str(path), chunk_size=3))
+    assert chunks[0][0] == 0
+    assert chunks[-1][1] == path.stat().st_size
+    data = path.read_bytes()
+    for (_, end), (start, _) in zip(chunks, chunks[1:]):
+        assert end == start
+        assert data[end - 1:end] == b"\n"
+
+
+@pytest.mark.parametrize("chunk_size", [64, 1024, 1 << 20])
+def test_parallel_matches_serial(chunk_size):
+    """ Test that parallel parsing yields the same addresses in order. """
+    expected = parse_addresses(ADDRESSES_TXT)
+    assert len(expected) == 233
+    actual = list(iter_addresses(ADDRESSES_TXT, workers=3,
+                                 chunk_size=chunk_size))
+    assert actual == expected
+
+
+@pytest.mark.parametrize("newline", ["\n", "\r\n", "\r"])
+@pytest.mark.parametrize("workers", [1, 2])
+def test_line_endings_and_encoding(tmp_path, workers, newline):
+    """ Test that every path reads UTF-8 with universal newlines. """
+    path = tmp_path / "addresses.txt"
+    lines = ["30 Memorial Drive, Avon MA 02322",
+             "12 Rue Cézanne, Québec QC 12345",
+             "700 Oak Street, Brockton MA 02301"]
+    path.write_bytes(newline.join(lines + [""]).encode("utf-8"))
+    addresses = list(iter_addresses(str(path), workers=workers,
+                                    chunk_size=8))
+    assert addresses == [parse_address(line) for line in lines]
+    assert addresses[1]["city"] == "Québec"
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_parse_stats(tmp_path, workers):
+    """ Test counters, reject channel and slowest lines. """
+    path = tmp_path / "addresses.txt"
+    path.write_text("30 Memorial Drive, Avon MA 02322\n"
+                    "garbage\n"
+                    "700 Oak Street, Brockton MA 02301\n"
+                    "\n")
+    rejects = io.StringIO()
+    stats = ParseStats(keep_slowest=2, rejects=rejects)
+    addresses = list(iter_addresses(str(path), workers=workers,
+                                    chunk_size=8, stats=stats))
+    stats.finish()
+    assert len(addresses) == 2
+    assert (stats.lines_read, stats.matched, stats.rejected) == (4, 2, 2)
+    assert sum(stats.histogram) == 4
+    assert len(stats.slowest) == 2
+    assert rejects.getvalue() == "2\tgarbage\n4\t\n"
+    assert "4 lines" in stats.summary()
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_parse_stats_keep_slowest(workers):
+    """ Test that workers keep as many slowest lines as requested. """
+    stats = ParseStats(keep_slowest=50)
+    list(iter_addresses(ADDRESSES_TXT, workers=workers, chunk_size=1 << 20,
+                        stats=stats))
+    assert len(stats.slowest) == 50
+
+
+def test_cached_parser():
+    """ Test LRU hits, misses, evictions and read-only results. """
+    parser = CachedParser(maxsize=2)
+    first = parser("30 Memorial Drive, Avon MA 02322")
+    assert parser("30 Memorial Drive, Avon MA 02322") is first
+    assert first == parse_address("30 Memorial Drive, Avon MA 02322")
+    with pytest.raises(TypeError):
+        first["zip"] = "00000"
+    assert parser("garbage") is None
+    assert parser("garbage") is None
+    parser("700 Oak Street, Brockton MA 02301")
+    assert parser.counters() == {"hits": 2, "misses": 3, "evictions": 1,
+                                 "size": 2}
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_iter_addresses_with_cache(tmp_path, workers):
+    """ Test that caching does not change results and counts repeats. """
+    path = tmp_path / "repeats.txt"
+    with open(ADDRESSES_TXT) as file:
+        lines = file.read()
+    path.write_text(lines * 3)
+    parser = CachedParser()
+    addresses = list(iter_addresses(str(path), workers=workers,
+                                    chunk_size=1 << 20, parser=parser))
+    assert [dict(a) for a in addresses] == parse_addresses(ADDRESSES_TXT) * 3
+    assert parser.misses == 234
+    assert parser.hits == 2 * 234
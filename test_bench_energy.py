@@ -0,0 +1,45 @@
+from bench_energy import (TEMPLATE, generate_dataset, percentiles,
+                          run_benchmark)
+from energy import EnergyDB
+import json
+import pytest
+
+
+def test_percentiles():
+    """ Test nearest-rank percentiles. """
+    samples = list(range(1, 101))
+    assert percentiles(samples) == {"p50": 50, "p99": 99}
+    assert percentiles([3.0]) == {"p50": 3.0, "p99": 3.0}
+
+
+def test_generate_dataset(tmp_path):
+    """ Test that synthetic data scales and loads into EnergyDB. """
+    small = str(tmp_path / "x1.csv")
+    large = str(tmp_path / "x3.csv")
+    rows = generate_dataset(small, scale=1, seed=1)
+    assert generate_dataset(large, scale=3, seed=1) == pytest.approx(
+        3 * rows, rel=0.1)
+    assert EnergyDB(small).load_report["rows"] == rows
+    # the set of state names does not grow with the scale
+    query = "SELECT DISTINCT state FROM production"
+    assert set(EnergyDB(large).conn.execute(query)) <= \
+        set(EnergyDB(TEMPLATE).conn.execute(query))
+
+    again = str(tmp_path / "again.csv")
+    generate_dataset(again, scale=1, seed=1)
+    with open(small) as a, open(again) as b:
+        assert a.read() == b.read()
+
+
+def test_run_benchmark(tmp_path):
+    """ Test that a benchmark result is complete and JSON-serializable. """
+    path = str(tmp_path / "x1.csv")
+    rows = generate_dataset(path)
+    result = run_benchmark(path, "sqlite", queries=20)
+    assert result["rows"] == rows
+    assert result["data_bytes"] > 0
+    assert result["peak_rss_bytes"] > 0
+    for name in ("by_source", "grouped"):
+        latency = result["latency_seconds"][name]
+        assert 0 < latency["p50"] <= latency["p99"]
+    json.dumps(result)
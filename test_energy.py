@@ -0,0 +1,431 @@
+from concurrent.futures import ThreadPoolExecutor
+from energy import EnergyDB, convert, is_binary, parse_args, read_batches
+import io
+import os
+import pytest
+
+
+ENERGY_CSV = os.path.join(os.path.dirname(__file__), "energy.csv")
+
+
+SAMPLE = """Year,State,Energy Source,Megawatthours
+2016,MD,Wind,100.0
+2017,MD,Wind,250.5
+2017,VA,Wind,49.5
+2017,MD,Solar Thermal and Photovoltaic,10.0
+2017,VA,Coal,1000.0
+"""
+
+
+@pytest.fixture
+def sample_csv(tmp_path):
+    path = tmp_path / "energy.csv"
+    path.write_text(SAMPLE)
+    return str(path)
+
+
+def test_read_batches():
+    """ Test that read_batches() splits parsed rows into batches. """
+    file = io.StringIO(SAMPLE)
+    file.readline()
+    batches = list(read_batches(file, batch_size=2))
+    assert [len(b) for b in batches] == [2, 2, 1]
+    assert batches[0][0] == (2016, "MD", "Wind", 100.0)
+
+
+def test_read_load_report(sample_csv):
+    """ Test that read() loads every row and reports throughput. """
+    e = EnergyDB(sample_csv)
+    assert e.load_report["rows"] == 5
+    assert e.load_report["rows_per_sec"] > 0
+
+
+def test_production_by_source(sample_csv):
+    """ Test totals by source and year. """
+    e = EnergyDB(sample_csv)
+    assert e.production_by_source("Wind", 2017) == pytest.approx(300.0)
+    assert e.production_by_source("Wind", 2016) == pytest.approx(100.0)
+    assert e.production_by_source("Wind", 1990) is None
+
+
+def test_production_by_source_full_file():
+    """ Test the bulk loader against the bundled data set. """
+    e = EnergyDB(ENERGY_CSV)
+    assert e.production_by_source("Wind", 2017) == pytest.approx(254302660.0)
+
+
+def test_snapshot_cache(sample_csv, tmp_path):
+    """ Test that a valid snapshot is reused and a stale one rebuilt. """
+    cache = str(tmp_path / "energy.db")
+    assert EnergyDB(sample_csv, cache=cache).load_report["source"] == "csv"
+    e = EnergyDB(sample_csv, cache=cache)
+    assert e.load_report["source"] == "cache"
+    assert e.production_by_source("Wind", 2017) == pytest.approx(300.0)
+
+    with open(sample_csv, "a") as file:
+        file.write("2017,DE,Wind,1.0\n")
+    e = EnergyDB(sample_csv, cache=cache)
+    assert e.load_report["source"] == "csv"
+    assert e.production_by_source("Wind", 2017) == pytest.approx(301.0)
+
+
+def test_snapshot_key_covers_loaded_bytes(sample_csv, tmp_path):
+    """ Test that rows appended during a load invalidate its snapshot. """
+    cache = str(tmp_path / "energy.db")
+    e = EnergyDB(sample_csv)
+    # as if appended while the file was being loaded
+    with open(sample_csv, "a") as file:
+        file.write("2017,DE,Wind,1.0\n")
+    e.save_snapshot(cache, sample_csv)
+    e = EnergyDB(sample_csv, cache=cache)
+    assert e.load_report["source"] == "csv"
+    assert e.production_by_source("Wind", 2017) == pytest.approx(301.0)
+    assert e.refresh() == 0
+
+
+def test_snapshot_restores_offset(sample_csv, tmp_path):
+    """ Test resuming refresh() from a snapshot of a partly written file. """
+    cache = str(tmp_path / "energy.db")
+    with open(sample_csv, "a") as file:
+        file.write("2018,MD,Wi")
+    EnergyDB(sample_csv, cache=cache)
+    e = EnergyDB(sample_csv, cache=cache)
+    assert e.load_report["source"] == "cache"
+    with open(sample_csv, "a") as file:
+        file.write("nd,5.0\n")
+    assert e.refresh() == 1
+    assert e.production_by_source("Wind", 2018) == pytest.approx(5.0)
+
+
+def test_production_matrix(sample_csv):
+    """ Test that the batch query agrees with production_by_source(). """
+    e = EnergyDB(sample_csv)
+    totals = e.production_matrix()
+    assert totals[("Wind", 2017)] == pytest.approx(300.0)
+    assert totals[("Coal", 2017)] == pytest.approx(1000.0)
+    for (source, year), total in totals.items():
+        assert e.production_by_source(source, year) == pytest.approx(total)
+
+    totals = e.production_matrix(sources=["Wind"], years=[2017],
+                                 states=["MD"], by_state=True)
+    assert totals == {("Wind", 2017, "MD"): pytest.approx(250.5)}
+    assert e.production_matrix(sources=["Nuclear"]) == {}
+
+
+@pytest.mark.parametrize("by_state", [False, True])
+def test_numpy_backend_matches_sqlite(by_state):
+    """ Test that the numpy backend returns the same totals as SQLite. """
+    pytest.importorskip("numpy")
+    sqlite_db = EnergyDB(ENERGY_CSV)
+    numpy_db = EnergyDB(ENERGY_CSV, backend="numpy")
+    expected = sqlite_db.production_matrix(by_state=by_state)
+    actual = numpy_db.production_matrix(by_state=by_state)
+    assert actual.keys() == expected.keys()
+    for key, total in expected.items():
+        assert actual[key] == pytest.approx(total)
+    assert numpy_db.production_by_source("Wind", 2017) == \
+        pytest.approx(sqlite_db.production_by_source("Wind", 2017))
+    assert numpy_db.production_by_source("Wind", 1900) is None
+    assert numpy_db.production_matrix(sources=["Wind"], years=[2017],
+                                      states=["MD"]) == \
+        sqlite_db.production_matrix(sources=["Wind"], years=[2017],
+                                    states=["MD"])
+
+
+def test_numpy_backend_many_names(tmp_path):
+    """ Test that name codes widen past the int16 range. """
+    pytest.importorskip("numpy")
+    path = tmp_path / "energy.csv"
+    rows = "".join(f"2017,S{i},Wind,1.0\n" for i in range(40_000))
+    path.write_text("Year,State,Energy Source,Megawatthours\n" + rows)
+    e = EnergyDB(str(path), backend="numpy")
+    assert e.columns.state.dtype.itemsize == 4
+    assert e.columns.source.dtype.itemsize == 2
+    assert e.production_matrix(states=["S39999"], by_state=True) == \
+        {("Wind", 2017, "S39999"): 1.0}
+
+
+def test_bad_backend(sample_csv):
+    """ Test that unknown backends are rejected. """
+    with pytest.raises(ValueError):
+        EnergyDB(sample_csv, backend="csv")
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "numpy"])
+def test_rollup_cube(sample_csv, backend):
+    """ Test cube lookups and incremental maintenance on append. """
+    if backend == "numpy":
+        pytest.importorskip("numpy")
+    e = EnergyDB(sample_csv, backend=backend, rollup=True)
+    assert e.production_by_source("Wind", 2017) == pytest.approx(300.0)
+    assert e.total_production(2017) == pytest.approx(1310.0)
+    assert e.total_production(2017, state="VA") == pytest.approx(1049.5)
+    assert e.total_production(2017, state="MD", source="Wind") == \
+        pytest.approx(250.5)
+    assert e.total_production(1990) is None
+
+    e.append([(2017, "DE", "Wind", 1.0), (2018, "DE", "Wind", 2.0)])
+    assert e.production_by_source("Wind", 2017) == pytest.approx(301.0)
+    assert e.production_matrix(years=[2018]) == {("Wind", 2018): 2.0}
+    assert e.production_matrix(states=["DE"], by_state=True) == {
+        ("Wind", 2017, "DE"): 1.0, ("Wind", 2018, "DE"): 2.0}
+
+    # the cube must agree with a fresh scan of the appended data
+    e.cube = None
+    assert e.production_by_source("Wind", 2017) == pytest.approx(301.0)
+    assert e.total_production(2018, state="DE") == pytest.approx(2.0)
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "numpy"])
+def test_refresh(sample_csv, backend):
+    """ Test that refresh() ingests only complete, newly appended rows. """
+    if backend == "numpy":
+        pytest.importorskip("numpy")
+    e = EnergyDB(sample_csv, backend=backend, rollup=True)
+    assert e.refresh() == 0
+
+    with open(sample_csv, "a") as file:
+        file.write("2018,MD,Wind,5.0\n2018,VA,Wi")
+    assert e.refresh() == 1
+    assert e.production_by_source("Wind", 2018) == pytest.approx(5.0)
+
+    with open(sample_csv, "a") as file:
+        file.write("nd,7.0\n")
+    assert e.refresh() == 1
+    assert e.production_by_source("Wind", 2018) == pytest.approx(12.0)
+    assert e.production_by_source("Wind", 2017) == pytest.approx(300.0)
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "numpy"])
+def test_refresh_bad_row_is_not_reingested(sample_csv, backend):
+    """ Test that rows before a bad row are appended only once. """
+    if backend == "numpy":
+        pytest.importorskip("numpy")
+    e = EnergyDB(sample_csv, backend=backend, rollup=True)
+    with open(sample_csv, "a") as file:
+        file.write("2018,MD,Wind,5.0\n2018,MD,Wind,oops\n")
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            e.refresh(batch_size=1)
+        assert e.production_by_source("Wind", 2018) == pytest.approx(5.0)
+        assert e.cube.by_source["Wind", 2018] == pytest.approx(5.0)
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "numpy"])
+def test_read_leaves_partial_last_line(sample_csv, backend):
+    """ Test that the initial load stops at the last newline. """
+    if backend == "numpy":
+        pytest.importorskip("numpy")
+    with open(sample_csv, "a") as file:
+        file.write("2017,VA,Wind,7")
+    e = EnergyDB(sample_csv, backend=backend)
+    assert e.load_report["rows"] == 5
+    with open(sample_csv, "a") as file:
+        file.write(".5\n")
+    assert e.refresh() == 1
+    assert e.production_by_source("Wind", 2017) == pytest.approx(307.5)
+    with open(sample_csv, "a") as file:
+        file.write("2018,MD")
+    assert EnergyDB(sample_csv, backend=backend).load_report["rows"] == 6
+
+
+def test_refresh_rejects_rewritten_file(sample_csv):
+    """ Test that a changed header or truncated file is not appended. """
+    e = EnergyDB(sample_csv)
+    with open(sample_csv, "w") as file:
+        file.write("Year,State,Energy Source,Megawatthours\n")
+    with pytest.raises(ValueError):
+        e.refresh()
+    with open(sample_csv, "w") as file:
+        file.write("year,state,source,mwh\n")
+    with pytest.raises(ValueError):
+        e.refresh()
+
+
+def test_refresh_after_snapshot(sample_csv, tmp_path):
+    """ Test that a database loaded from a snapshot can be refreshed. """
+    cache = str(tmp_path / "energy.db")
+    EnergyDB(sample_csv, cache=cache)
+    e = EnergyDB(sample_csv, cache=cache)
+    assert e.load_report["source"] == "cache"
+    with open(sample_csv, "a") as file:
+        file.write("2018,MD,Wind,5.0\n")
+    assert e.refresh() == 1
+    assert e.production_by_source("Wind", 2018) == pytest.approx(5.0)
+
+
+def test_reader_pool():
+    """ Test parallel queries through a pool over one shared database. """
+    e = EnergyDB(ENERGY_CSV, shared=True)
+    expected = e.production_matrix()
+    with e.reader_pool(size=4) as pool:
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(
+                lambda key: pool.production_by_source(*key), expected))
+        assert results == list(expected.values())
+        assert pool.production_matrix(years=[2017]) == \
+            e.production_matrix(years=[2017])
+
+
+def test_reader_pool_requires_shared(sample_csv):
+    """ Test that a private database cannot be pooled. """
+    with pytest.raises(ValueError):
+        EnergyDB(sample_csv).reader_pool()
+
+
+@pytest.fixture
+def shards(tmp_path):
+    header, *rows = SAMPLE.splitlines()
+    paths = []
+    for i, row in enumerate(rows):
+        path = tmp_path / f"shard{i}.csv"
+        path.write_text(f"{header}\n{row}\n")
+        paths.append(str(path))
+    return paths
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "numpy"])
+def test_read_shards(sample_csv, shards, tmp_path, backend):
+    """ Test that shards given as a list or glob load like one file. """
+    if backend == "numpy":
+        pytest.importorskip("numpy")
+    expected = EnergyDB(sample_csv).production_matrix(by_state=True)
+    e = EnergyDB(shards, backend=backend, workers=2)
+    assert e.production_matrix(by_state=True) == expected
+    assert [s["file"] for s in e.load_report["shards"]] == shards
+    assert [s["rows"] for s in e.load_report["shards"]] == [1] * 5
+
+    e = EnergyDB(str(tmp_path / "shard*.csv"), backend=backend, workers=2)
+    assert e.load_report["rows"] == 5
+    with pytest.raises(ValueError):
+        e.refresh()
+
+
+def test_read_shards_header_mismatch(shards):
+    """ Test that shards with different headers are rejected. """
+    with open(shards[-1], "w") as file:
+        file.write("year,state,source,mwh\n2017,VA,Coal,1.0\n")
+    with pytest.raises(ValueError):
+        EnergyDB(shards, workers=2)
+
+
+def test_read_shards_schema_errors(shards):
+    """ Test that bad headers and rows name the shard file and line. """
+    with open(shards[1], "w") as file:
+        file.write("Year,State,Megawatthours\n2017,VA,1.0\n")
+    with pytest.raises(ValueError, match=r"shard1\.csv, line 1: header"):
+        EnergyDB(shards, workers=2)
+    with open(shards[1], "w") as file:
+        file.write("Year,State,Energy Source,Megawatthours\n"
+                   "2017,VA,Coal,1.0\n2017,VA,3.0\n")
+    with pytest.raises(ValueError, match=r"shard1\.csv, line 3: "):
+        EnergyDB(shards, workers=2)
+    with open(shards[1], "w") as file:
+        file.write("Year,State,Energy Source,Megawatthours\n"
+                   "2017,VA,Coal,lots\n")
+    with pytest.raises(ValueError, match=r"shard1\.csv, line 2: "):
+        EnergyDB(shards, workers=2)
+
+
+def test_analytics(sample_csv):
+    """ Test the window-function analytics on a small data set. """
+    e = EnergyDB(sample_csv)
+    assert e.yoy_growth("Wind") == (
+        (2016, 100.0, None), (2017, 300.0, pytest.approx(2.0)))
+    assert e.yoy_growth("Wind", state="VA") == ((2017, 49.5, None),)
+    assert e.rolling_average("Wind", window=2) == (
+        (2016, 100.0), (2017, 200.0))
+    assert e.rolling_average("Wind", window=1)[-1] == (2017, 300.0)
+    shares = e.source_share("MD", 2017)
+    assert [s[0] for s in shares] == ["Wind",
+                                      "Solar Thermal and Photovoltaic"]
+    assert sum(s[2] for s in shares) == pytest.approx(1.0)
+    assert e.top_states("Wind", n=1) == (
+        (2016, 1, "MD", 100.0), (2017, 1, "MD", 250.5))
+    assert e.top_states("Wind", n=5, years=[2017]) == (
+        (2017, 1, "MD", 250.5), (2017, 2, "VA", 49.5))
+    with pytest.raises(ValueError):
+        e.rolling_average("Wind", window=0)
+
+
+def test_analytics_result_cache(sample_csv):
+    """ Test that results are cached, bounded and invalidated on append. """
+    e = EnergyDB(sample_csv, result_cache_size=2)
+    first = e.yoy_growth("Wind")
+    assert e.yoy_growth("Wind") is first
+    assert (e.results.hits, e.results.misses) == (1, 1)
+
+    e.source_share("MD", 2017)
+    e.source_share("VA", 2017)
+    assert len(e.results) == 2
+    assert e.yoy_growth("Wind") is not first
+
+    e.append([(2018, "MD", "Wind", 600.0)])
+    assert len(e.results) == 0
+    assert e.yoy_growth("Wind")[-1] == (2018, 600.0, pytest.approx(1.0))
+
+
+@pytest.mark.parametrize("source_backend", ["sqlite", "numpy"])
+@pytest.mark.parametrize("backend", ["sqlite", "numpy"])
+def test_binary_round_trip(tmp_path, source_backend, backend):
+    """ Test that exported binary files load with the same totals. """
+    if "numpy" in (source_backend, backend):
+        pytest.importorskip("numpy")
+    path = str(tmp_path / "energy.edb")
+    original = EnergyDB(ENERGY_CSV, backend=source_backend)
+    original.export_binary(path)
+    assert is_binary(path)
+    assert not is_binary(ENERGY_CSV)
+
+    e = EnergyDB(path, backend=backend)
+    assert e.load_report["source"] == "binary"
+    assert e.load_report["rows"] == original.load_report["rows"]
+    expected = original.production_matrix(by_state=True)
+    actual = e.production_matrix(by_state=True)
+    assert actual.keys() == expected.keys()
+    for key, total in expected.items():
+        assert actual[key] == pytest.approx(total)
+    with pytest.raises(ValueError):
+        e.refresh()
+
+
+def test_binary_export_in_place(tmp_path):
+    """ Test re-exporting a mapped binary file over itself. """
+    pytest.importorskip("numpy")
+    path = str(tmp_path / "energy.edb")
+    EnergyDB(ENERGY_CSV).export_binary(path)
+    e = EnergyDB(path, backend="numpy")
+    expected = e.production_matrix()
+    e.export_binary(path)
+    assert e.production_matrix() == expected
+    assert EnergyDB(path, backend="numpy").production_matrix() == expected
+    assert os.listdir(tmp_path) == ["energy.edb"]
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "numpy"])
+def test_binary_many_names(tmp_path, backend):
+    """ Test binary files whose name codes need int32. """
+    pytest.importorskip("numpy")
+    csv_path = tmp_path / "energy.csv"
+    rows = "".join(f"2017,S{i},Wind,{i}.0\n" for i in range(40_001))
+    csv_path.write_text("Year,State,Energy Source,Megawatthours\n" + rows)
+    path = str(tmp_path / "energy.edb")
+    EnergyDB(str(csv_path), backend=backend).export_binary(path)
+    for reader in ("sqlite", "numpy"):
+        e = EnergyDB(path, backend=reader)
+        assert e.production_matrix(states=["S40000"], by_state=True) == \
+            {("Wind", 2017, "S40000"): 40000.0}
+
+
+def test_convert_cli(tmp_path, capsys):
+    """ Test the --convert option. """
+    path = str(tmp_path / "energy.edb")
+    args = parse_args([ENERGY_CSV, "--convert", path])
+    assert args.convert == path
+    convert(args.file, args.convert)
+    assert "11836 rows" in capsys.readouterr().out
+    assert EnergyDB(path).production_by_source("Wind", 2017) == \
+        pytest.approx(254302660.0)
+    assert parse_args([ENERGY_CSV]).convert is None
+    # a data file may be named like the old subcommand
+    assert parse_args(["convert", ENERGY_CSV]).file == ["convert", ENERGY_CSV]
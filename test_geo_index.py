@@ -0,0 +1,68 @@
+from geo_index import GeoIndex
+from haversine import Point, haversine
+import random
+import pytest
+
+np = pytest.importorskip("numpy")
+
+
+@pytest.fixture
+def points():
+    rng = random.Random(326)
+    points = [(rng.uniform(-90, 90), rng.uniform(-180, 180))
+              for _ in range(2000)]
+    # clusters at the poles and on both sides of the antimeridian
+    points += [(89.9, rng.uniform(-180, 180)) for _ in range(20)]
+    points += [(rng.uniform(-10, 10), rng.choice([-179.95, 179.95]))
+               for _ in range(20)]
+    return points
+
+
+@pytest.mark.parametrize("query", [(38.98, -76.94), (0.0, 180.0),
+                                   (89.5, 10.0), (-45.0, -179.9)])
+@pytest.mark.parametrize("units", ["km", "mi"])
+def test_within(points, query, units):
+    """ Test radius queries against a brute-force search. """
+    index = GeoIndex.from_points(points, cell_size=2.5)
+    radius = 1500
+    expected = sorted((haversine(query, p, units), i)
+                      for i, p in enumerate(points)
+                      if haversine(query, p, units) <= radius)
+    found, distances = index.within(query, radius, units)
+    assert found.tolist() == [i for _, i in expected]
+    assert distances == pytest.approx([d for d, _ in expected], rel=1e-12)
+
+
+@pytest.mark.parametrize("query", [(38.98, -76.94), (0.0, -180.0),
+                                   (-90.0, 0.0)])
+def test_nearest(points, query):
+    """ Test k-nearest queries against a brute-force search. """
+    index = GeoIndex.from_points(points)
+    expected = sorted((haversine(query, p), i) for i, p in enumerate(points))
+    found, distances = index.nearest(query, k=5)
+    assert found.tolist() == [i for _, i in expected[:5]]
+    found, _ = index.nearest(query, k=len(points) + 10)
+    assert len(found) == len(points)
+
+
+def test_from_points_accepts_points(points):
+    """ Test building an index from Point objects. """
+    index = GeoIndex.from_points([Point(*p) for p in points[:100]])
+    expected = GeoIndex.from_points(points[:100])
+    assert index.nearest((38.98, -76.94), k=3)[0].tolist() == \
+        expected.nearest((38.98, -76.94), k=3)[0].tolist()
+    assert index.within(Point(38.98, -76.94), 3000)[0].tolist() == \
+        expected.within((38.98, -76.94), 3000)[0].tolist()
+
+
+def test_errors():
+    """ Test validation of points and parameters. """
+    with pytest.raises(ValueError):
+        GeoIndex([91], [0])
+    with pytest.raises(ValueError):
+        GeoIndex([0, 1], [0])
+    with pytest.raises(ValueError):
+        GeoIndex([0], [0], cell_size=0)
+    with pytest.raises(ValueError):
+        GeoIndex([0], [0]).nearest((0, 0), k=0)
+    assert GeoIndex([], []).nearest((0, 0))[0].tolist() == []
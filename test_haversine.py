@@ -0,0 +1,185 @@
+from array import array
+from io import StringIO
+import json
+from haversine import (Point, haversine, haversine_from, haversine_many, main,
+                       pairs_within, pairwise_distances, stream_distances)
+import random
+import pytest
+
+np = pytest.importorskip("numpy")
+
+
+@pytest.fixture
+def points():
+    rng = random.Random(326)
+    return [(rng.uniform(-90, 90), rng.uniform(-180, 180))
+            for _ in range(200)]
+
+
+def test_haversine():
+    """ Test the scalar function and its argument checks. """
+    assert haversine((38.9, -77.0), (40.7, -74.0)) == pytest.approx(325.24,
+                                                                     abs=0.01)
+    with pytest.raises(ValueError):
+        haversine((0, 0), (0, 0), units="m")
+    with pytest.raises(ValueError):
+        haversine((0, 0, 0), (0, 0))
+
+
+@pytest.mark.parametrize("units", ["km", "mi"])
+def test_point_fast_path(points, units):
+    """ Test that Points give the same distances as tuples. """
+    for p1, p2 in zip(points[:100], points[100:]):
+        expected = haversine(p1, p2, units)
+        assert haversine(Point(*p1), Point(*p2), units) == pytest.approx(
+            expected, rel=1e-12)
+        assert haversine(Point(*p1), p2, units) == pytest.approx(expected,
+                                                                 rel=1e-12)
+        assert haversine(p1, Point(*p2), units) == pytest.approx(expected,
+                                                                 rel=1e-12)
+    with pytest.raises(ValueError):
+        haversine(Point(0, 0), (0, 0, 0))
+    with pytest.raises(ValueError):
+        haversine(("0", 0), Point(0, 0))
+
+
+def test_point():
+    """ Test Point validation, immutability and tuple behaviour. """
+    point = Point(38.98, -76)
+    assert tuple(point) == (38.98, -76.0)
+    assert (point[0], point[-1]) == (38.98, -76.0)
+    assert point == Point(38.98, -76.0) and len({point, Point(38.98, -76)}) == 1
+    assert repr(point) == "Point(38.98, -76.0)"
+    with pytest.raises(AttributeError):
+        point.lat = 0
+    for lat, lon in [(91, 0), (0, -181), ("1", 0), (True, 0)]:
+        with pytest.raises(ValueError):
+            Point(lat, lon)
+
+
+@pytest.mark.parametrize("units", ["km", "mi"])
+def test_haversine_many_matches_scalar(points, units):
+    """ Test the vectorized pairs against the scalar function. """
+    first, second = points[:100], points[100:]
+    lats1, lons1 = zip(*first)
+    lats2, lons2 = zip(*second)
+    distances = haversine_many(array("d", lats1), array("d", lons1),
+                               np.array(lats2), list(lons2), units=units)
+    expected = [haversine(p1, p2, units) for p1, p2 in zip(first, second)]
+    assert distances == pytest.approx(expected, rel=1e-12)
+
+
+def test_haversine_from_matches_scalar(points):
+    """ Test one-to-many distances against the scalar function. """
+    origin = (38.98, -76.94)
+    lats, lons = zip(*points)
+    expected = [haversine(origin, p) for p in points]
+    assert haversine_from(origin, lats, lons) == pytest.approx(expected,
+                                                               rel=1e-12)
+
+
+def test_haversine_from_point(points):
+    """ Test a Point as the origin of one-to-many distances. """
+    lats, lons = zip(*points)
+    assert haversine_from(Point(38.98, -76.94), lats, lons) == pytest.approx(
+        haversine_from((38.98, -76.94), lats, lons), rel=1e-12)
+
+
+def test_haversine_many_errors():
+    """ Test validation of units, values and shapes. """
+    with pytest.raises(ValueError):
+        haversine_many([0], [0], [0], [0], units="m")
+    with pytest.raises(ValueError):
+        haversine_many(["a"], [0], [0], [0])
+    with pytest.raises(ValueError):
+        haversine_many([0, 1], [0, 1], [0, 1, 2], [0, 1, 2])
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_pairwise_distances(points, tmp_path, workers):
+    """ Test tiled distances streamed to a callback and a .npy file. """
+    lats, lons = zip(*points)
+    expected = np.array([[haversine(p1, p2) for p2 in points[:50]]
+                         for p1 in points])
+    tiles = []
+    matrix = pairwise_distances(lats, lons, lats[:50], lons[:50],
+                                callback=lambda r, c, t: tiles.append((r, c)),
+                                out=tmp_path / "d.npy", tile_size=32,
+                                workers=workers)
+    assert tiles == [(r, c) for r in range(0, 200, 32) for c in (0, 32)]
+    assert np.allclose(matrix, expected, rtol=1e-12)
+    assert np.allclose(np.load(tmp_path / "d.npy"), expected, rtol=1e-12)
+    with pytest.raises(ValueError):
+        pairwise_distances(lats, lons)
+
+
+def test_pairs_within(points):
+    """ Test the sparse threshold mode against a brute-force search. """
+    lats, lons = zip(*points)
+    expected = [(i, j) for i in range(200) for j in range(i + 1, 200)
+                if haversine(points[i], points[j]) <= 2000]
+    i, j, d = pairs_within(lats, lons, 2000, tile_size=16, workers=2)
+    assert list(zip(i.tolist(), j.tolist())) == expected
+    assert d == pytest.approx([haversine(points[a], points[b])
+                               for a, b in expected], rel=1e-12)
+    i, j, d = pairs_within(lats, lons, 2000, lats, lons, tile_size=16)
+    assert len(i) == 2 * len(expected) + 200
+    i, j, d = pairs_within(lats[:1], lons[:1], 0.001, lats[1:], lons[1:])
+    assert len(i) == len(j) == len(d) == 0
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_stream_distances_csv(points, workers):
+    """ Test CSV input with a reordered header, bad lines and batching. """
+    pairs = list(zip(points[:100], points[100:]))
+    lines = ["id,lon2,lat2,lon1,lat1"]
+    lines += [f"{i},{p2[1]},{p2[0]},{p1[1]},{p1[0]}"
+              for i, (p1, p2) in enumerate(pairs)]
+    lines.insert(50, "50,oops,1,2,3")
+    out = StringIO()
+    assert stream_distances(StringIO("\n".join(lines)), out, batch_size=7,
+                            workers=workers) == (101, 1)
+    result = out.getvalue().splitlines()
+    assert result[49] == "nan"
+    expected = [haversine(p1, p2) for p1, p2 in pairs]
+    assert [float(d) for d in result[:49] + result[50:]] == pytest.approx(
+        expected, abs=1e-6)
+
+
+def test_stream_distances_jsonl(points):
+    """ Test JSONL input, units and headerless CSV. """
+    p1, p2 = points[0], points[1]
+    record = dict(zip(["lat1", "lon1", "lat2", "lon2"], p1 + p2))
+    out = StringIO()
+    stream_distances(StringIO(json.dumps(record) + "\n\n[]\n"), out,
+                     format="jsonl", units="mi")
+    distance, bad = out.getvalue().splitlines()
+    assert float(distance) == pytest.approx(haversine(p1, p2, "mi"), abs=1e-6)
+    assert bad == "nan"
+    out = StringIO()
+    stream_distances(StringIO(",".join(map(str, p1 + p2))), out)
+    assert float(out.getvalue()) == pytest.approx(haversine(p1, p2), abs=1e-6)
+    with pytest.raises(ValueError):
+        stream_distances(StringIO("lat1,lon1\n"), StringIO())
+
+
+def test_main(tmp_path, capsys):
+    """ Test the command-line entry point with files. """
+    source = tmp_path / "pairs.jsonl"
+    source.write_text('{"lat1": 38.9, "lon1": -77.0, "lat2": 40.7,'
+                      ' "lon2": -74.0}\n')
+    main(str(source), output=str(tmp_path / "out.txt"), summary=True)
+    assert (tmp_path / "out.txt").read_text() == "325.239441\n"
+    assert "1 pairs (0 bad)" in capsys.readouterr().err
+
+
+def test_stream_distances_keeps_lines_aligned():
+    """ Test that comment-like and non-header first lines stay rows. """
+    out = StringIO()
+    text = "lat1,lon1,lat2,lon2\n10,20,30,40\n#x,1,2,3\n1,2,3,4\n"
+    assert stream_distances(StringIO(text), out) == (3, 1)
+    assert out.getvalue().splitlines()[1:] == ["nan", "314.491779"]
+    for first in ("foo,1,2,3", "10,20,30,40,note"):
+        out = StringIO()
+        assert stream_distances(StringIO(first + "\n1,2,3,4\n"), out)[0] == 2
+        assert out.getvalue().splitlines()[1] == "314.491779"
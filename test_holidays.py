@@ -0,0 +1,234 @@
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+import pytest
+
+requests = pytest.importorskip("requests")
+
+from holidays import (HolidayCache, HolidayCalendar, fetch_holidays,
+                      fetch_many, get_holidays, latency_summary, parse_args)
+
+HOLIDAYS = {
+    ("FR", 2023): [{"date": "2023-07-14", "localName": "Fête nationale",
+                    "name": "Bastille Day"}],
+    ("US", 2024): [{"date": "2024-01-01", "localName": "New Year's Day",
+                    "name": "New Year's Day"},
+                   {"date": "2024-07-04", "localName": "Independence Day",
+                    "name": "Independence Day"}],
+}
+
+
+class StubAPI(BaseHTTPRequestHandler):
+    """ Serves HOLIDAYS at /{country}/{year} with an ETag. """
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests.append((self.path, dict(self.headers)))
+            self.server.active += 1
+            self.server.peak = max(self.server.peak, self.server.active)
+            failures = self.server.failures.get(self.path, [])
+            status = failures.pop(0) if failures else None
+        try:
+            time.sleep(self.server.delay)
+            if status is not None:
+                self.send_response(status)
+                self.send_header("Retry-After", "0")
+                self.end_headers()
+                return
+            self.respond()
+        finally:
+            with self.server.lock:
+                self.server.active -= 1
+
+    def respond(self):
+        _, country, year = self.path.split("/")
+        holidays = HOLIDAYS.get((country, int(year)))
+        if self.server.down or holidays is None:
+            self.send_response(503 if self.server.down else 404)
+            self.end_headers()
+            return
+        etag = f'"{country}-{year}-v{self.server.version}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = json.dumps(holidays).encode()
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", "Mon, 01 Jan 2024 00:00:00 GMT")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StubAPI)
+    httpd.requests = []
+    httpd.down = False
+    httpd.version = 1
+    httpd.lock = threading.Lock()
+    httpd.active = httpd.peak = 0
+    httpd.failures = {}
+    httpd.delay = 0
+    httpd.url = (f"http://127.0.0.1:{httpd.server_port}"
+                 "/{country_code}/{year}")
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_cache_fresh_and_revalidate(server, tmp_path):
+    """ Test TTL hits, 304 revalidation and refetch on a new ETag. """
+    cache = HolidayCache(str(tmp_path), ttl=3600)
+    assert fetch_holidays("US", 2024, cache, api_url=server.url) == \
+        HOLIDAYS["US", 2024]
+    assert fetch_holidays("US", 2024, cache, api_url=server.url) == \
+        HOLIDAYS["US", 2024]
+    assert len(server.requests) == 1
+
+    cache.ttl = 0
+    assert fetch_holidays("US", 2024, cache, api_url=server.url) == \
+        HOLIDAYS["US", 2024]
+    _, headers = server.requests[-1]
+    assert headers["If-None-Match"] == '"US-2024-v1"'
+    assert headers["If-Modified-Since"] == "Mon, 01 Jan 2024 00:00:00 GMT"
+
+    server.version = 2
+    fetch_holidays("US", 2024, cache, api_url=server.url)
+    assert cache.load("US", 2024)["etag"] == '"US-2024-v2"'
+    assert len(server.requests) == 3
+
+
+def test_offline_and_stale(server, tmp_path):
+    """ Test offline mode and serving stale entries when the API fails. """
+    cache = HolidayCache(str(tmp_path), ttl=0)
+    with pytest.raises(LookupError):
+        fetch_holidays("US", 2024, cache, offline=True, api_url=server.url)
+    fetch_holidays("US", 2024, cache, api_url=server.url)
+    server.down = True
+    assert fetch_holidays("US", 2024, cache, offline=True,
+                          api_url=server.url) == HOLIDAYS["US", 2024]
+    assert len(server.requests) == 1
+    assert fetch_holidays("US", 2024, cache, api_url=server.url) == \
+        HOLIDAYS["US", 2024]
+    with pytest.raises(requests.exceptions.HTTPError):
+        fetch_holidays("FR", 2024, cache, api_url=server.url)
+
+
+def test_get_holidays_prints(server, tmp_path, capsys):
+    """ Test that get_holidays prints cached holidays and errors. """
+    cache = HolidayCache(str(tmp_path))
+    fetch_holidays("US", 2024, cache, api_url=server.url)
+    assert get_holidays("US", 2024, cache, offline=True) == HOLIDAYS["US", 2024]
+    assert capsys.readouterr().out.splitlines() == [
+        "2024-01-01: New Year's Day", "2024-07-04: Independence Day"]
+    assert get_holidays("FR", 2024, cache, offline=True) is None
+    assert capsys.readouterr().out.startswith("Error finding holidays")
+
+
+def test_fetch_many(server, tmp_path):
+    """ Test concurrency limit, retries on 429/5xx, errors and metrics. """
+    server.delay = 0.02
+    server.failures = {"/US/2024": [429, 503], "/FR/2023": [500] * 5}
+    pairs = [("US", 2024), ("FR", 2023), ("DE", 2024)]
+    pairs += [("US", year) for year in range(2000, 2010)]
+    results, metrics = fetch_many(pairs, workers=3, retries=2, backoff=0.001,
+                                  api_url=server.url)
+    assert results["US", 2024] == HOLIDAYS["US", 2024]
+    assert isinstance(results["FR", 2023], requests.exceptions.HTTPError)
+    assert isinstance(results["US", 2001], requests.exceptions.HTTPError)
+    assert server.peak <= 3
+    assert [(m["country_code"], m["year"]) for m in metrics] == pairs
+    us, fr = metrics[0], metrics[1]
+    assert (us["attempts"], us["source"], us["error"]) == (3, "network", None)
+    assert (fr["attempts"], fr["source"]) == (3, "error")
+    assert all(m["seconds"] >= 0.02 for m in metrics)
+    summary = latency_summary(metrics)
+    assert summary.startswith("13 requests: 12 error, 1 network; 4 retries")
+    assert "p99" in summary
+
+    cache = HolidayCache(str(tmp_path))
+    fetch_many([("US", 2024)], cache, api_url=server.url)
+    results, metrics = fetch_many([("US", 2024)], cache, offline=True)
+    assert metrics[0]["source"] == "cache"
+
+
+def test_parse_args():
+    """ Test single and bulk command-line arguments. """
+    args = parse_args(["US", "2024"])
+    assert (args.country_codes, args.years) == (["US"], [2024])
+    args = parse_args(["US,FR", "2020-2022", "--workers", "4"])
+    assert args.country_codes == ["US", "FR"]
+    assert args.years == [2020, 2021, 2022] and args.workers == 4
+    with pytest.raises(SystemExit):
+        parse_args(["US", "2024-2020"])
+
+
+@pytest.fixture
+def calendar():
+    calendar = HolidayCalendar()
+    calendar.add("US", 2024, HOLIDAYS["US", 2024] + [
+        {"date": "2024-12-25", "name": "Christmas Day"},
+        {"date": "2024-12-28", "name": "A Saturday"},
+        {"date": "2024-03-04", "name": "Regional", "global": False}])
+    calendar.add("us", 2025, [{"date": "2025-01-01", "name": "New Year"}])
+    return calendar
+
+
+def test_calendar_queries(calendar):
+    """ Test holiday and business-day queries. """
+    assert calendar.is_holiday(date(2024, 7, 4), "US")
+    assert not calendar.is_holiday(date(2024, 7, 5), "us")
+    assert not calendar.is_holiday(date(2024, 3, 4), "US")
+    assert calendar.is_business_day(date(2024, 3, 4), "US")
+    assert not calendar.is_business_day(date(2024, 12, 28), "US")
+    assert calendar.next_business_day(date(2024, 7, 3), "US") == date(2024, 7, 5)
+    assert calendar.next_business_day(date(2024, 12, 27), "US") == \
+        date(2024, 12, 30)
+    assert calendar.next_business_day(date(2024, 12, 31), "US") == \
+        date(2025, 1, 2)
+    with pytest.raises(LookupError):
+        calendar.is_holiday(date(2023, 12, 31), "US")
+    with pytest.raises(LookupError):
+        calendar.is_holiday(date(2024, 1, 1), "FR")
+
+
+def test_business_days_between(calendar):
+    """ Test business-day counts against a day-by-day count. """
+    def brute(start, end):
+        days = (start + timedelta(days=i) for i in range((end - start).days))
+        return sum(calendar.is_business_day(day, "US") for day in days)
+
+    start = date(2024, 1, 1)
+    for offset, length in [(0, 366), (3, 10), (180, 200), (360, 6), (5, 0),
+                           (100, 365)]:
+        first = start + timedelta(days=offset)
+        last = first + timedelta(days=length)
+        assert calendar.business_days_between(first, last, "US") == \
+            brute(first, last)
+        assert calendar.business_days_between(last, first, "US") == \
+            -brute(first, last)
+    assert calendar.business_days_between(start, date(2025, 1, 1), "US") == 259
+    with pytest.raises(LookupError):
+        calendar.business_days_between(start, date(2026, 1, 2), "US")
+    calendar.add("US", 2027, [])
+    with pytest.raises(LookupError):
+        calendar.business_days_between(start, date(2027, 6, 1), "US")
+
+
+def test_calendar_fetch(server, tmp_path):
+    """ Test building a calendar from the API and from the cache. """
+    cache = HolidayCache(str(tmp_path))
+    calendar = HolidayCalendar.fetch(["US"], [2024], cache, api_url=server.url)
+    assert calendar.is_holiday(date(2024, 1, 1), "US")
+    calendar = HolidayCalendar.fetch(["US"], [2024], cache, offline=True)
+    assert calendar.is_holiday(date(2024, 7, 4), "US")
+    with pytest.raises(LookupError):
+        HolidayCalendar.fetch(["FR"], [2023], cache, offline=True)